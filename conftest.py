@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """ Чистит кэш перед каждым тестом
+
+    pytest-django переставляет тесты всех приложений, и жетоны лимитов
+    записей одного теста не должны доставаться следующему.
+    """
+    from django.core.cache import cache
+    cache.clear()
@@ -1,8 +1,34 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
+from . import exporter
 from .models import Comment, Follow, Group, Post
 
 
+def export_action(data_format, compress=False):
+    """ Действие админки: потоковая выгрузка выбранных записей """
+    def action(modeladmin, request, queryset):
+        kind = modeladmin.export_kind
+        response = StreamingHttpResponse(
+            exporter.export([kind], data_format, compress,
+                            querysets={kind: queryset}),
+            content_type=("application/gzip" if compress
+                          else exporter.CONTENT_TYPES[data_format]))
+        name = exporter.filename([kind], data_format, compress)
+        response["Content-Disposition"] = f'attachment; filename="{name}"'
+        return response
+
+    suffix = f"{data_format}_gz" if compress else data_format
+    action.__name__ = f"export_{suffix}"
+    action.short_description = (
+        f"Выгрузить в {data_format.upper()}" + (" (gzip)" if compress else ""))
+    return action
+
+
+EXPORT_ACTIONS = [export_action("jsonl"), export_action("jsonl", True),
+                  export_action("csv")]
+
+
 class PostAdmin(admin.ModelAdmin):
     # Перечисляем поля для отображения в таблице
     list_display = ("pk", "text", "pub_date", "author", "group", "image")
@@ -12,6 +38,8 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     # если пустое значение то...
     empty_value_display = "-пусто-"
+    actions = EXPORT_ACTIONS
+    export_kind = "post"
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -21,15 +49,21 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ("pk", "post", "author", "text")
+    list_display = ("pk", "post", "parent", "author", "text")
     search_fields = ("text", "author")
+    # путь ветки пишется один раз, перенос в другую ветку его не обновит
+    readonly_fields = ("parent",)
     empty_value = "-пусто-"
+    actions = EXPORT_ACTIONS
+    export_kind = "comment"
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ("pk", "user", "author")
     search_fields = ()
     empty_value = "-пусто-"
+    actions = EXPORT_ACTIONS
+    export_kind = "follow"
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,117 @@
+""" JSON API лент только для чтения
+
+Ответ собирается из values_list: модели не создаются, шаблоны не
+рендерятся, а число запросов к базе не зависит от размера страницы.
+Число комментариев берется из Post.comments_count, автор и сообщество -
+из того же запроса через JOIN. Бюджеты запросов - в QUERY_BUDGETS_FILE,
+как и у страниц; их проверяют тесты (posts/tests/test_api.py).
+"""
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from .models import Group, Post, ProfileStats
+from .paginator import CursorPaginator
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+MAX_BATCH = 100
+
+POST_FIELDS = ("id", "text", "pub_date", "author_name", "group_slug",
+               "image", "comments_count")
+
+
+def post_rows(posts):
+    """ Плоские строки постов одним запросом, без моделей """
+    return (posts.annotate(author_name=F("author__username"),
+                           group_slug=F("group__slug"))
+            .values_list(*POST_FIELDS, named=True))
+
+
+def serialize(row):
+    return {
+        "id": row.id,
+        "text": row.text,
+        "pub_date": row.pub_date,
+        "author": row.author_name,
+        "group": row.group_slug,
+        "image": default_storage.url(row.image) if row.image else None,
+        "comments_count": row.comments_count,
+        "url": reverse("posts:post", args=[row.author_name, row.id]),
+    }
+
+
+def error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_response(data):
+    return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get("limit", PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def feed_response(request, posts, **extra):
+    """ Страница ленты по курсорам ?after=/?before= """
+    page = CursorPaginator(post_rows(posts), page_size(request)).get_page(
+        request.GET.get("after"), request.GET.get("before"))
+    return api_response({
+        **extra,
+        "results": [serialize(row) for row in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
+
+
+def index(request):
+    """ Главная лента """
+    return feed_response(request, Post.objects.all())
+
+
+def group(request, slug):
+    """ Лента сообщества """
+    group = get_object_or_404(Group.objects.only("id", "title", "slug"),
+                              slug=slug)
+    return feed_response(
+        request, Post.objects.filter(group_id=group.pk),
+        group={"slug": group.slug, "title": group.title})
+
+
+def profile(request, username):
+    """ Лента автора со счетчиками профиля """
+    user = get_object_or_404(
+        get_user_model().objects.select_related("stats"), username=username)
+    stats = ProfileStats.for_user(user)
+    return feed_response(
+        request, Post.objects.filter(author_id=user.pk),
+        author={"username": user.username,
+                "full_name": user.get_full_name(),
+                "posts_count": stats.posts_count,
+                "followers_count": stats.followers_count,
+                "following_count": stats.following_count})
+
+
+def posts_batch(request):
+    """ Посты по списку id (?ids=1,2,3) в порядке запроса """
+    try:
+        ids = [int(value) for value in request.GET.get("ids", "").split(",")
+               if value.strip()]
+    except ValueError:
+        return error("ids должны быть целыми числами через запятую")
+    if len(ids) > MAX_BATCH:
+        return error(f"Не больше {MAX_BATCH} id за запрос")
+    rows = {row.id: row
+            for row in post_rows(Post.objects.filter(pk__in=ids).order_by())}
+    return api_response({
+        "results": [serialize(rows[pk]) for pk in ids if pk in rows],
+        "missing": [pk for pk in ids if pk not in rows],
+    })
@@ -0,0 +1,231 @@
+""" Наборы данных и замеры для bench_views
+
+Набор данных каждого размера живет в своем файле SQLite и создается
+один раз: bulk_create пачками, затем счетчики, ленты, поисковый индекс и
+рейтинг популярных постов досчитываются целиком, как после import_posts.
+Страницы запрашиваются тестовым клиентом, а разбивку времени (база,
+шаблоны, всё вместе) и число запросов отдает RequestStatsMiddleware в
+заголовках ответа.
+"""
+import datetime as dt
+import io
+import json
+import logging
+import math
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import feed, search, threads, trending
+from .importer import original_dates
+from .models import Comment, Follow, Group, Post, ProfileStats
+from .paginator import encode_cursor
+
+User = get_user_model()
+
+GROUPS = 20
+FOLLOWED_AUTHORS = 50
+WORDS = ("самолёт аэродром небо облако полёт крыло мотор пилот посадка "
+         "взлёт курс ветер карта маршрут погода рейс").split()
+
+
+def dataset_info(path):
+    try:
+        with open(path + ".json", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def generate(size, path, batch_size=5000, log=print):
+    """ Заполняет пустую базу: size постов, авторы, подписки, комментарии """
+    authors = max(10, size // 100)
+    started = time.monotonic()
+    groups = Group.objects.bulk_create(
+        [Group(title=f"Сообщество {number}", slug=f"group-{number}")
+         for number in range(GROUPS)])
+    group_ids = [group.pk for group in Group.objects.order_by("pk")]
+    User.objects.bulk_create(
+        [User(username=f"author{number}", password="!")
+         for number in range(authors)]
+        + [User(username="bench_reader", password="!")])
+    author_ids = list(User.objects.filter(
+        username__startswith="author").order_by("pk").values_list(
+            "pk", flat=True))
+    reader = User.objects.get(username="bench_reader")
+
+    first_date = timezone.now() - dt.timedelta(seconds=size)
+    # посты выходят раз в секунду: без этого auto_now_add поставит всем
+    # одну дату, и глубокие страницы и рейтинг популярности не проверить
+    with original_dates():
+        for start in range(0, size, batch_size):
+            Post.objects.bulk_create([
+                Post(author_id=author_ids[number % authors],
+                     # каждый пятый пост - вне сообществ
+                     group_id=(group_ids[number % GROUPS]
+                               if number % 5 else None),
+                     pub_date=first_date + dt.timedelta(seconds=number),
+                     text=" ".join(WORDS[(number + shift) % len(WORDS)]
+                                   for shift in range(12)) + f" №{number}")
+                for number in range(start, min(start + batch_size, size))
+            ])
+            log(f"  постов: {min(start + batch_size, size)}/{size}")
+
+    Follow.objects.bulk_create(
+        [Follow(user=reader, author_id=author_id)
+         for author_id in author_ids[:FOLLOWED_AUTHORS]]
+        + [Follow(user_id=author_ids[number], author_id=author_ids[0])
+           for number in range(1, authors)])
+    for author_id in author_ids[:FOLLOWED_AUTHORS]:
+        feed.backfill(reader.pk, author_id)
+
+    # комментарии к последним постам, по три на пост
+    recent = Post.objects.order_by("-pub_date").values_list(
+        "pk", flat=True)[:max(size // 30, 1)]
+    Comment.objects.bulk_create(
+        [Comment(post_id=post_id, author=reader, text=f"Комментарий {shift}")
+         for post_id in recent for shift in range(3)],
+        batch_size=batch_size)
+    threads.fill_paths(Comment.objects.all(), batch_size)
+    call_command("reconcile_comments", stdout=io.StringIO())
+
+    posts = dict(Post.objects.order_by().values("author_id").annotate(
+        total=Count("pk")).values_list("author_id", "total"))
+    followers = dict(Follow.objects.order_by().values("author_id").annotate(
+        total=Count("pk")).values_list("author_id", "total"))
+    following = dict(Follow.objects.order_by().values("user_id").annotate(
+        total=Count("pk")).values_list("user_id", "total"))
+    ProfileStats.objects.all().delete()
+    ProfileStats.objects.bulk_create(
+        [ProfileStats(user_id=user_id,
+                      posts_count=posts.get(user_id, 0),
+                      followers_count=followers.get(user_id, 0),
+                      following_count=following.get(user_id, 0))
+         for user_id in author_ids + [reader.pk]],
+        batch_size=batch_size)
+
+    search.get_backend().reindex(Post.objects.all(), batch_size=batch_size)
+    trending.update(full=True, batch_size=batch_size)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    info = {"size": size, "authors": authors, "groups": len(groups),
+            "seconds": round(time.monotonic() - started, 1)}
+    with open(path + ".json", "w", encoding="utf-8") as file:
+        json.dump(info, file)
+    return info
+
+
+def scenarios():
+    """ Имя -> (метод, адрес, данные) для всех маршрутов posts.urls """
+    reader = User.objects.get(username="bench_reader")
+    author = User.objects.get(username="author0")
+    group = Group.objects.order_by("pk").first()
+    post = Post.objects.filter(author=author).order_by("-pub_date").first()
+    # курсор середины ленты: страница далеко от начала
+    middle = Post.objects.order_by("-pub_date", "-id").values_list(
+        "pub_date", "pk")[Post.objects.count() // 2]
+    pages = Post.objects.count() // 10
+    username = author.username
+    return reader, {
+        "index": ("get", reverse("posts:index"), None),
+        "index_deep_page": ("get", reverse("posts:index")
+                            + f"?page={max(pages // 2, 1)}", None),
+        "index_deep_cursor": ("get", reverse("posts:index")
+                              + f"?after={encode_cursor(*middle)}", None),
+        "group_posts": ("get", reverse("posts:group_slug",
+                                       args=[group.slug]), None),
+        "show_groups": ("get", reverse("posts:show_groups"), None),
+        "profile": ("get", reverse("posts:profile", args=[username]), None),
+        "view_post": ("get", reverse("posts:post",
+                                     args=[username, post.pk]), None),
+        "more_comments": ("get", reverse("posts:comments",
+                                         args=[username, post.pk]), None),
+        "view_follow_index": ("get", reverse("posts:follow_index"), None),
+        "trending": ("get", reverse("posts:trending"), None),
+        "new_post_form": ("get", reverse("posts:new_post"), None),
+        "new_post": ("post", reverse("posts:new_post"),
+                     {"text": "Новая запись из бенчмарка"}),
+        "add_comment": ("post", reverse("posts:add_comment",
+                                        args=[username, post.pk]),
+                        {"text": "Комментарий из бенчмарка"}),
+        "search": ("get", reverse("posts:search") + "?q=аэродром", None),
+        "api_index": ("get", reverse("posts:api_index"), None),
+        "api_profile": ("get", reverse("posts:api_profile",
+                                       args=[username]), None),
+    }
+
+
+def percentile(values, share):
+    """ Перцентиль по ближайшему рангу """
+    ordered = sorted(values)
+    rank = math.ceil(share / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def server_timing(response):
+    """ {"db": мс, "tpl": мс, "total": мс} из заголовка Server-Timing """
+    timings = {}
+    for part in response.get("Server-Timing", "").split(","):
+        name, _, duration = part.strip().partition(";dur=")
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+
+def measure(requests=50, warmup=3, cold=True, only=None):
+    """ Перцентили времени и число запросов для каждого сценария """
+    reader, cases = scenarios()
+    client = Client()
+    client.force_login(reader)
+    # превышения бюджетов видно в отчете, в лог их не дублируем
+    request_log = logging.getLogger("yatube.requests")
+    level = request_log.level
+    request_log.setLevel(logging.ERROR)
+    try:
+        # сотни записей подряд - это и есть замер, а не злоупотребление
+        with override_settings(RATE_LIMITS={}):
+            return {name: measure_case(client, name, case, requests,
+                                       warmup, cold)
+                    for name, case in cases.items()
+                    if not only or name in only}
+    finally:
+        request_log.setLevel(level)
+
+
+def measure_case(client, name, case, requests, warmup, cold):
+    method, url, data = case
+    send = getattr(client, method)
+    totals, sql, templates, queries = [], [], [], []
+    for number in range(warmup + requests):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        response = send(url, data) if data else send(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name}: {url} -> {response.status_code}")
+        if number < warmup:
+            continue
+        timing = server_timing(response)
+        totals.append(elapsed)
+        sql.append(timing.get("db", 0.0))
+        templates.append(timing.get("tpl", 0.0))
+        queries.append(int(response.get("X-Query-Count", 0)))
+    return {
+        "url": url,
+        "requests": requests,
+        "p50_ms": round(percentile(totals, 50), 2),
+        "p95_ms": round(percentile(totals, 95), 2),
+        "p99_ms": round(percentile(totals, 99), 2),
+        "sql_p50_ms": round(percentile(sql, 50), 2),
+        "template_p50_ms": round(percentile(templates, 50), 2),
+        "queries": max(queries),
+    }
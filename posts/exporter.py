@@ -0,0 +1,124 @@
+""" Потоковая выгрузка постов, комментариев и подписок
+
+Записи читаются из базы через iterator(chunk_size) и сразу превращаются
+в строки JSONL или CSV, поэтому в памяти не бывает больше одной пачки
+строк, как бы велика ни была таблица. Формат записей совпадает с тем,
+что читает import_posts: авторы по username, сообщества по slug.
+"""
+import csv
+import json
+import zlib
+
+from .models import Comment, Follow, Post
+
+# поле записи -> путь в values_list
+FIELDS = {
+    "post": {
+        "id": "id",
+        "author": "author__username",
+        "group": "group__slug",
+        "text": "text",
+        "pub_date": "pub_date",
+        "image": "image",
+    },
+    "comment": {
+        "id": "id",
+        "post": "post_id",
+        "parent": "parent_id",
+        "author": "author__username",
+        "text": "text",
+        "created": "created",
+    },
+    "follow": {
+        "user": "user__username",
+        "author": "author__username",
+    },
+}
+
+MODELS = {"post": Post, "comment": Comment, "follow": Follow}
+
+CONTENT_TYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+
+def records(kind, queryset=None, chunk_size=2000):
+    """ Записи одного вида в порядке первичного ключа """
+    if queryset is None:
+        queryset = MODELS[kind].objects.all()
+    fields = FIELDS[kind]
+    rows = queryset.order_by("pk").values_list(*fields.values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = dict(zip(fields, row))
+        for name, value in record.items():
+            if hasattr(value, "isoformat"):
+                record[name] = value.isoformat()
+        yield record
+
+
+def jsonl_lines(kind, items):
+    for record in items:
+        yield json.dumps({"type": kind, **record}, ensure_ascii=False) + "\n"
+
+
+class _Line:
+    """ Файл для csv.writer, который возвращает строку, а не копит её """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(kind, items):
+    writer = csv.writer(_Line())
+    yield writer.writerow(list(FIELDS[kind]))
+    for record in items:
+        yield writer.writerow(
+            ["" if value is None else value for value in record.values()])
+
+
+def encoded(lines, batch=1000):
+    """ Склеивает строки в куски побольше, чтобы не писать по строке """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= batch:
+            yield "".join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield "".join(chunk).encode()
+
+
+def gzipped(chunks, level=6):
+    """ Сжимает поток кусков в gzip, не собирая его целиком """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(kinds, data_format="jsonl", compress=False, querysets=None,
+           chunk_size=2000):
+    """ Поток байтов выгрузки
+
+    В CSV у каждого вида свои колонки, поэтому вид может быть только один.
+    querysets позволяет выгрузить не всю таблицу, а выбранные строки.
+    """
+    if data_format == "csv" and len(kinds) != 1:
+        raise ValueError("В CSV выгружается только один вид записей")
+    querysets = querysets or {}
+
+    def lines():
+        for kind in kinds:
+            items = records(kind, querysets.get(kind), chunk_size)
+            if data_format == "csv":
+                yield from csv_lines(kind, items)
+            else:
+                yield from jsonl_lines(kind, items)
+
+    chunks = encoded(lines())
+    return gzipped(chunks) if compress else chunks
+
+
+def filename(kinds, data_format, compress=False):
+    return (f"yatube-{'-'.join(kinds)}.{data_format}"
+            + (".gz" if compress else ""))
@@ -0,0 +1,231 @@
+""" Материализованная лента подписок (fan-out on write)
+
+При публикации пост раскладывается в FeedEntry всем подписчикам автора,
+поэтому /follow/ читает уже отсортированные id из одной таблицы.
+Посты авторов с большим числом подписчиков не раскладываются, а
+подтягиваются при чтении, чтобы один пост не порождал миллионы записей.
+Пропущенное при этом запоминается в FanOutBacklog: пока строка есть,
+автор читается напрямую, даже если снова уложился в FEED_FANOUT_LIMIT,
+а команда fan_out_backlog раскладывает пропущенные посты пачками уже вне
+запросов пользователей.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q
+
+from .models import FanOutBacklog, FeedEntry, Follow, Post
+
+# поля, которые показывает карточка поста (post_item.html)
+CARD_FIELDS = ("id", "text", "pub_date", "image", "card_images",
+               "comments_count",
+               "author", "author__id", "author__username",
+               "group", "group__id", "group__title", "group__slug")
+
+
+def post_cards(posts=None):
+    """ Посты для карточек лент одним запросом
+
+    Автор и сообщество приходят JOIN-ом, число комментариев - из
+    Post.comments_count, лишние колонки не читаются. Все ленты строятся
+    через эту функцию.
+    """
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.select_related("author", "group").only(*CARD_FIELDS)
+
+
+def is_large_author(author_id):
+    """ Слишком много подписчиков для раскладки поста по лентам """
+    followers = Follow.objects.filter(author_id=author_id).count()
+    return followers > settings.FEED_FANOUT_LIMIT
+
+
+def fan_out_post(post):
+    """ Кладет новый пост в ленты всех подписчиков автора """
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """ Раскладывает пачку постов по лентам одним запросом на чтение """
+    authors = {post.author_id for post in posts}
+    large_authors = set(
+        Follow.objects.filter(author_id__in=authors)
+        .values("author_id")
+        .annotate(followers=Count("pk"))
+        .filter(followers__gt=settings.FEED_FANOUT_LIMIT)
+        .values_list("author_id", flat=True)
+    )
+    for author_id in large_authors:
+        remember_backlog(author_id, post_id=min(
+            post.id for post in posts if post.author_id == author_id) - 1)
+    followers = {}
+    for author_id, user_id in Follow.objects.filter(
+            author_id__in=authors - large_authors).values_list(
+                "author_id", "user_id"):
+        followers.setdefault(author_id, []).append(user_id)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post.id,
+                   author_id=post.author_id, pub_date=post.pub_date)
+         for post in posts
+         for user_id in followers.get(post.author_id, ())],
+        ignore_conflicts=True
+    )
+
+
+def update_post_date(post):
+    """ При редактировании пост получает новую дату - переносим её в ленты """
+    FeedEntry.objects.filter(post_id=post.id).exclude(
+        pub_date=post.pub_date).update(pub_date=post.pub_date)
+
+
+def backfill(user_id, author_id):
+    """ После подписки докладывает в ленту уже опубликованные посты автора """
+    if is_large_author(author_id):
+        remember_backlog(author_id, new_user_id=user_id)
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by().values_list(
+        "id", "pub_date")
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id, author_id=author_id,
+                   pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()],
+        ignore_conflicts=True
+    )
+
+
+def remember_backlog(author_id, post_id=None, new_user_id=None):
+    """ Запоминает, с какого места посты автора перестали раскладываться
+
+    post_id - последний разложенный пост, по умолчанию последний пост
+    автора; подписка new_user_id - первая, что не получила старых постов.
+    Если автор уже в FanOutBacklog, прежняя отметка остается.
+    """
+    if FanOutBacklog.objects.filter(author_id=author_id).exists():
+        return
+    if post_id is None:
+        post_id = Post.objects.filter(author_id=author_id).aggregate(
+            last=Max("pk"))["last"] or 0
+    follows = Follow.objects.filter(author_id=author_id)
+    if new_user_id is not None:
+        follows = follows.exclude(user_id=new_user_id)
+    follow_id = follows.aggregate(last=Max("pk"))["last"] or 0
+    FanOutBacklog.objects.bulk_create(
+        [FanOutBacklog(author_id=author_id, post_id=post_id,
+                       follow_id=follow_id)],
+        ignore_conflicts=True)
+
+
+def drain_author(backlog, batch_size):
+    """ Раскладывает пропущенные посты одного автора, пачками по постам
+
+    Новые посты - всем подписчикам, старые - только подписавшимся после
+    отметки. Курсор сохраняется после каждой пачки, поэтому прерванную
+    раскладку можно продолжить.
+    """
+    author_id = backlog.author_id
+    followers = dict(Follow.objects.filter(author_id=author_id).values_list(
+        "user_id", "pk"))
+    joined = [user_id for user_id, follow_id in followers.items()
+              if follow_id > backlog.follow_id]
+    start = backlog.last_post_id
+    if not joined:
+        start = max(start, backlog.post_id)
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        "pk").values_list("pk", "pub_date")
+    per_batch = max(batch_size // max(len(followers), 1), 1)
+    written = 0
+    while True:
+        batch = list(posts.filter(pk__gt=start)[:per_batch])
+        if not batch:
+            break
+        entries = [FeedEntry(user_id=user_id, post_id=post_id,
+                             author_id=author_id, pub_date=pub_date)
+                   for post_id, pub_date in batch
+                   for user_id in (followers if post_id > backlog.post_id
+                                   else joined)]
+        FeedEntry.objects.bulk_create(entries, batch_size=batch_size,
+                                      ignore_conflicts=True)
+        written += len(entries)
+        start = batch[-1][0]
+        FanOutBacklog.objects.filter(pk=author_id).update(last_post_id=start)
+    # автор мог снова стать популярным, пока шла раскладка
+    if not is_large_author(author_id):
+        FanOutBacklog.objects.filter(pk=author_id).delete()
+    return written
+
+
+def drain_backlog(batch_size=1000):
+    """ Раскладывает посты авторов, снова уложившихся в FEED_FANOUT_LIMIT
+
+    Возвращает число записанных строк ленты.
+    """
+    written = 0
+    for backlog in FanOutBacklog.objects.order_by("pk").iterator():
+        if not is_large_author(backlog.author_id):
+            written += drain_author(backlog, batch_size)
+    return written
+
+
+def prune(user_id, author_id):
+    """ После отписки убирает посты автора из ленты """
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def large_authors_followed(user):
+    """ id авторов из подписок, чьи посты читаются напрямую из Post
+
+    Это популярные авторы и те, чьи посты еще ждут fan_out_backlog.
+    """
+    return list(
+        Follow.objects.filter(user=user)
+        .values("author_id")
+        .annotate(followers=Count("author__following"))
+        .filter(Q(followers__gt=settings.FEED_FANOUT_LIMIT)
+                | Q(author_id__in=FanOutBacklog.objects.values("author_id")))
+        .values_list("author_id", flat=True)
+    )
+
+
+def follow_feed_sources(user):
+    """ Части ленты подписок: материализованная лента и популярные авторы
+
+    Каждая часть отдает (pub_date, post_id); паджинатор фильтрует части
+    по курсору и объединяет их через union.
+    """
+    # порядок колонок важен для union: аннотации идут после полей модели
+    sources = [FeedEntry.objects.filter(user=user).values_list(
+        "pub_date", "post_id", named=True)]
+    # по части на автора: каждая читается по индексу (author, pub_date)
+    # уже упорядоченной, и union сливает их без сортировки; union без all
+    # убирает дубли, если автор стал популярным недавно
+    for author_id in large_authors_followed(user):
+        sources.append(Post.objects.filter(author_id=author_id)
+                       .annotate(post_id=F("id"))
+                       .values_list("pub_date", "post_id", named=True))
+    return sources
+
+
+def hydrate(rows):
+    """ Превращает страницу (pub_date, post_id) в посты одним запросом """
+    ids = [row.post_id for row in rows]
+    posts = post_cards().in_bulk(ids)
+    return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def follow_set_key(user_id):
+    return f"follow_set:{user_id}"
+
+
+def followed_author_ids(user):
+    """ Множество id авторов из подписок, кэшируется до подписки/отписки """
+    key = follow_set_key(user.pk)
+    authors = cache.get(key)
+    if authors is None:
+        authors = frozenset(Follow.objects.filter(user=user).values_list(
+            "author_id", flat=True))
+        cache.set(key, authors, settings.FOLLOW_SET_TIMEOUT)
+    return authors
+
+
+def forget_follow_set(user_id):
+    cache.delete(follow_set_key(user_id))
@@ -8,6 +8,21 @@ class PostForm(ModelForm):
         model = Post
         fields = ['text', 'group', 'image']
 
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        image = self.cleaned_data.get('image')
+        # forms.ImageField уже открыл картинку при проверке - берем размеры
+        # оттуда, а не из файла
+        if 'image' in self.changed_data:
+            size = getattr(getattr(image, 'image', None), 'size', None)
+            post.image_width, post.image_height = size or (None, None)
+            # варианты старой картинки не подходят, новые нарежет очередь
+            post.card_images = ''
+
+        if commit:
+            post.save()
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
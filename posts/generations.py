@@ -0,0 +1,118 @@
+""" Поколения кэша лент
+
+У каждой ленты (главная, сообщество, профиль) и у состояния подписок
+пользователя есть номер поколения. Номер входит в ключ кэша фрагмента и
+увеличивается при записи Post/Comment/Follow, поэтому фрагменты живут
+долго, но устаревшие никогда не показываются. Из тех же номеров
+собирается ETag страниц, и повторный запрос без изменений получает 304.
+
+Страница, прочитанная с реплики базы, может отставать от поколения,
+поэтому в ее ключ входит еще и поколение реплики "replica:<alias>",
+которое растет при каждом копировании (команда sync_replicas).
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router
+
+from .models import Post
+
+# параметры адреса, от которых зависит фрагмент ленты (номер или курсор
+# страницы); остальные в ключ не входят, чтобы ?x=<что угодно> не плодил
+# записи в кэше
+PAGE_PARAMS = ("page", "after", "before")
+
+
+def _key(scope):
+    return f"generation:{scope}"
+
+
+def _initial():
+    # если счетчик вытеснен из кэша, новое значение не должно совпасть
+    # со старым, поэтому стартуем от текущего времени
+    return int(time.time() * 1000)
+
+
+def get_generations(*scopes):
+    """ Номера поколений для нескольких лент за одно обращение к кэшу """
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """ Новое поколение: все фрагменты этих лент становятся устаревшими """
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial(), None)
+
+
+def post_scopes(author_id, group_id):
+    """ Ленты, в которых показывается пост """
+    scopes = ["index", f"profile:{author_id}"]
+    if group_id:
+        scopes.append(f"group:{group_id}")
+    return scopes
+
+
+def follow_scopes(user_id, author_id):
+    """ Что меняет подписка: набор подписок читателя и списки в профилях """
+    return [f"follow:{user_id}", f"relations:{user_id}",
+            f"relations:{author_id}"]
+
+
+def feed_key(request, *scopes, viewer="user"):
+    """ Строка, которая меняется вместе с лентами scopes и читателем
+
+    viewer определяет, от чего зависит разметка у вошедшего
+    пользователя: "user" - от него самого и его подписок (кнопки
+    подписки), любая другая строка - роль, общая для многих читателей.
+    """
+    user = request.user
+    # Post - любая модель лент: роутер выбирает базу на весь запрос
+    alias = router.db_for_read(Post)
+    if alias != DEFAULT_DB_ALIAS:
+        scopes += (f"replica:{alias}",)
+    parts = [f"{scope}={generation}" for scope, generation
+             in zip(scopes, get_generations(*scopes))]
+    if not user.is_authenticated:
+        parts.append("anon")
+    elif viewer == "user":
+        follow_generation, = get_generations(f"follow:{user.pk}")
+        parts.append(f"user={user.pk}:{follow_generation}")
+    else:
+        parts.append(viewer)
+    return "|".join(parts)
+
+
+def page_address(request):
+    """ Путь и параметры страницы ленты из PAGE_PARAMS, без остальных """
+    params = [(name, request.GET[name]) for name in PAGE_PARAMS
+              if name in request.GET]
+    return f"{request.path}?{urlencode(params)}"
+
+
+def feed_cache_context(request, *scopes, viewer="user"):
+    """ Ключ и время жизни фрагмента ленты для тега {% cache %} """
+    key = feed_key(request, *scopes, viewer=viewer)
+    return {"feed_cache_key": f"{key}|{page_address(request)}",
+            "feed_cache_timeout": settings.FEED_CACHE_TIMEOUT}
+
+
+def page_etag(request, *scopes):
+    """ ETag целой страницы: она зависит от читателя и его подписок
+
+    В ETag входит полный адрес: он нигде не хранится, а от параметров
+    вроде ?thread= зависит страница поста.
+    """
+    key = f"{feed_key(request, *scopes)}|{request.get_full_path()}"
+    return hashlib.md5(key.encode()).hexdigest()
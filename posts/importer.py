@@ -0,0 +1,305 @@
+""" Потоковый импорт постов, комментариев и подписок
+
+Записи читаются по одной из JSONL или CSV и копятся в пачки, которые
+сохраняются через bulk_create. bulk_create не шлет сигналы, поэтому то,
+что обычно делают обработчики из posts.signals (счетчики, ленты
+подписок, поисковый индекс, поколения кэша), выполняется здесь же для
+всей пачки сразу. В памяти держатся только текущие пачки и словари
+username -> id и slug -> id.
+
+Испорченная строка файла или запись с уже занятым id не прерывает
+импорт: она пропускается, попадает в счетчик skipped и в лог.
+"""
+import csv
+import json
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import feed, generations, search, threads, thumbnails
+from .models import Comment, Follow, Group, Post, ProfileStats
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+KINDS = ("post", "comment", "follow")
+
+
+class RecordError(ValueError):
+    """ Запись нельзя импортировать """
+
+
+def bad_line(on_error, line, error):
+    """ Строку не разобрать: сообщаем on_error или прерываем чтение """
+    error = RecordError(f"строка {line}: {error}")
+    if on_error is None:
+        raise error
+    on_error(error)
+
+
+def read_jsonl(stream, on_error=None):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            bad_line(on_error, number, error)
+            continue
+        if not isinstance(record, dict):
+            bad_line(on_error, number, "ожидался объект JSON")
+            continue
+        yield record
+
+
+def read_csv(stream, kind="post", on_error=None):
+    """ В CSV все строки одного вида, колонки - поля записи """
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            bad_line(on_error, reader.line_num, error)
+            continue
+        row.setdefault("type", kind)
+        yield row
+
+
+@contextmanager
+def original_dates():
+    """ Отключает auto_now_add, чтобы сохранить даты из архива """
+    fields = [Post._meta.get_field("pub_date"),
+              Comment._meta.get_field("created")]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f"Неверная дата: {value}")
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Importer:
+    def __init__(self, batch_size=1000, create_missing=False):
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.users = dict(User.objects.values_list("username", "id"))
+        self.groups = dict(Group.objects.values_list("slug", "id"))
+        self.posts, self.comments, self.follows = [], [], []
+        self.counts = Counter()
+
+    # разрешение ссылок
+
+    def user_id(self, username):
+        if not username:
+            raise RecordError("Не указан пользователь")
+        if username not in self.users:
+            if not self.create_missing:
+                raise RecordError(f"Нет пользователя {username}")
+            # без пароля: войти можно только после его сброса
+            self.users[username] = User.objects.create_user(username).id
+        return self.users[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            if not self.create_missing:
+                raise RecordError(f"Нет сообщества {slug}")
+            self.groups[slug] = Group.objects.create(title=slug, slug=slug).id
+        return self.groups[slug]
+
+    # накопление
+
+    def add(self, record):
+        """ Разбирает запись и кладет в пачку; False - запись пропущена """
+        kind = record.get("type") or "post"
+        try:
+            if kind == "post":
+                self.posts.append(Post(
+                    id=record.get("id") or None,
+                    text=record["text"],
+                    pub_date=parse_date(record.get("pub_date")),
+                    author_id=self.user_id(record.get("author")),
+                    group_id=self.group_id(record.get("group")),
+                    image=record.get("image") or None,
+                ))
+            elif kind == "comment":
+                self.comments.append(Comment(
+                    id=record.get("id") or None,
+                    post_id=int(record["post"]),
+                    parent_id=int(record["parent"]) if record.get(
+                        "parent") else None,
+                    text=record["text"],
+                    created=parse_date(record.get("created")),
+                    author_id=self.user_id(record.get("author")),
+                ))
+            elif kind == "follow":
+                self.follows.append(Follow(
+                    user_id=self.user_id(record.get("user")),
+                    author_id=self.user_id(record.get("author")),
+                ))
+            else:
+                raise RecordError(f"Неизвестный тип записи: {kind}")
+        except (RecordError, KeyError, TypeError, ValueError) as error:
+            self.skip(error)
+            return False
+        if self.full():
+            self.flush()
+        return True
+
+    def skip(self, error):
+        """ Запись не импортирована: считаем и пишем в лог причину """
+        self.counts["skipped"] += 1
+        logger.warning("Пропущена запись: %r", error)
+
+    def full(self):
+        return max(len(self.posts), len(self.comments),
+                   len(self.follows)) >= self.batch_size
+
+    def pending(self):
+        return len(self.posts) + len(self.comments) + len(self.follows)
+
+    def flush(self):
+        """ Сохраняет накопленное: посты раньше комментариев к ним """
+        self._flush_posts()
+        self._flush_follows()
+        self._flush_comments()
+
+    # сохранение пачек
+
+    def _without_taken_ids(self, model, objects):
+        """ Записи, чей явный id уже занят в базе или в пачке, пропускаются """
+        taken = set(model.objects.filter(
+            pk__in=[obj.pk for obj in objects if obj.pk is not None]
+        ).values_list("pk", flat=True))
+        fresh = []
+        for obj in objects:
+            if obj.pk is not None:
+                if obj.pk in taken:
+                    self.skip(RecordError(
+                        f"{model._meta.model_name} id={obj.pk} уже есть"))
+                    continue
+                taken.add(obj.pk)
+            fresh.append(obj)
+        return fresh
+
+    def _flush_posts(self):
+        posts, self.posts = self.posts, []
+        posts = self._without_taken_ids(Post, posts)
+        if not posts:
+            return
+        # sqlite не возвращает id после bulk_create: новые посты найдем
+        # как те, что получили id больше прежнего максимума
+        last_id = Post.objects.aggregate(last=Max("id"))["last"] or 0
+        with original_dates():
+            Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        for author_id, total in Counter(
+                post.author_id for post in posts).items():
+            ProfileStats.increment(author_id, "posts_count", total)
+        self.counts["posts"] += len(posts)
+        if not connection.features.can_return_ids_from_bulk_insert:
+            explicit = [post for post in posts if post.pk is not None]
+            created = Post.objects.filter(pk__gt=last_id).exclude(
+                pk__in=[post.pk for post in explicit])
+            posts = explicit + list(created)
+        feed.fan_out_posts(posts)
+        search.get_backend().index_many(posts)
+        for post in posts:
+            if post.image:
+                thumbnails.enqueue(post.pk)
+        scopes = set()
+        for post in posts:
+            scopes.update(generations.post_scopes(post.author_id,
+                                                  post.group_id))
+        generations.bump(*scopes)
+
+    def _flush_follows(self):
+        follows, self.follows = self.follows, []
+        if not follows:
+            return
+        existing = set(Follow.objects.filter(
+            user_id__in={follow.user_id for follow in follows},
+            author_id__in={follow.author_id for follow in follows},
+        ).values_list("user_id", "author_id"))
+        new = {}
+        for follow in follows:
+            pair = (follow.user_id, follow.author_id)
+            if pair in existing or pair in new or pair[0] == pair[1]:
+                self.counts["skipped"] += 1
+            else:
+                new[pair] = follow
+        Follow.objects.bulk_create(new.values(), batch_size=self.batch_size)
+        for user_id, total in Counter(user for user, _ in new).items():
+            ProfileStats.increment(user_id, "following_count", total)
+            feed.forget_follow_set(user_id)
+        for author_id, total in Counter(author for _, author in new).items():
+            ProfileStats.increment(author_id, "followers_count", total)
+        scopes = set()
+        for user_id, author_id in new:
+            scopes.update(generations.follow_scopes(user_id, author_id))
+            feed.backfill(user_id, author_id)
+        generations.bump(*scopes)
+        self.counts["follows"] += len(new)
+
+    def _flush_comments(self):
+        comments, self.comments = self.comments, []
+        comments = self._without_taken_ids(Comment, comments)
+        if not comments:
+            return
+        posts = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}
+        ).values_list("pk", flat=True))
+        # ответ можно сохранить, если родитель уже в базе или в этой пачке
+        parents = dict(Comment.objects.filter(
+            pk__in={comment.parent_id for comment in comments}
+        ).values_list("pk", "post_id"))
+        known = []
+        for comment in comments:
+            if comment.post_id not in posts or (
+                    comment.parent_id
+                    and parents.get(comment.parent_id) != comment.post_id):
+                continue
+            known.append(comment)
+            if comment.pk:
+                parents[comment.pk] = comment.post_id
+        self.counts["skipped"] += len(comments) - len(known)
+        last_id = Comment.objects.aggregate(last=Max("id"))["last"] or 0
+        with original_dates():
+            Comment.objects.bulk_create(known, batch_size=self.batch_size)
+        # пути веток зависят от id, поэтому пишутся вторым проходом
+        threads.fill_paths(
+            Comment.objects.filter(
+                Q(pk__gt=last_id)
+                | Q(pk__in=[comment.pk for comment in known if comment.pk])),
+            self.batch_size)
+        totals = Counter(comment.post_id for comment in known)
+        for post_id, total in totals.items():
+            Post.objects.filter(pk=post_id).update(
+                comments_count=F("comments_count") + total)
+        scopes = set()
+        for post_id, author_id, group_id in Post.objects.filter(
+                pk__in=totals).values_list("pk", "author_id", "group_id"):
+            scopes.update(generations.post_scopes(author_id, group_id))
+        generations.bump(*scopes)
+        self.counts["comments"] += len(known)
@@ -0,0 +1,114 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "filebased": "django.core.cache.backends.filebased.FileBasedCache",
+    "sqlite": "yatube.cache_backends.SQLiteCache",
+}
+
+
+def make_cache(name, directory):
+    """ Экземпляр бэкенда с хранилищем во временном каталоге """
+    location = {
+        "locmem": f"bench-{os.getpid()}",
+        "filebased": os.path.join(directory, "filebased"),
+        "sqlite": os.path.join(directory, "cache.sqlite3"),
+    }[name]
+    return import_string(BACKENDS[name])(
+        location, {"OPTIONS": {"MAX_ENTRIES": 1000000}})
+
+
+def timed(operation, count):
+    """ Операций в секунду """
+    started = time.perf_counter()
+    for number in range(count):
+        operation(number)
+    return count / (time.perf_counter() - started)
+
+
+def incr_worker(name, directory, count):
+    cache = make_cache(name, directory)
+    for _ in range(count):
+        try:
+            cache.incr("shared-counter")
+        except ValueError:
+            # FileBasedCache не атомарен: ключ может пропасть на время записи
+            pass
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает бэкенды кэша: LocMem, FileBased и общий SQLite. "
+            "Меряет set/get/incr и проверяет incr из нескольких процессов")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ops", type=int, default=5000,
+                            help="операций каждого вида")
+        parser.add_argument("--processes", type=int, default=4,
+                            help="процессов для проверки общего incr")
+        parser.add_argument("--backends", default=",".join(BACKENDS),
+                            help="список бэкендов через запятую")
+        parser.add_argument("--json", action="store_true",
+                            help="вывести результат в JSON")
+
+    def handle(self, *args, **options):
+        ops = options["ops"]
+        processes = options["processes"]
+        payload = {"text": "x" * 500, "ids": list(range(50))}
+        results = {}
+        for name in options["backends"].split(","):
+            directory = tempfile.mkdtemp(prefix="bench-cache-")
+            try:
+                cache = make_cache(name, directory)
+                cache.clear()
+                row = {
+                    "set": timed(lambda n: cache.set(f"key-{n}", payload),
+                                 ops),
+                    "get_hit": timed(lambda n: cache.get(f"key-{n}"), ops),
+                    "get_miss": timed(lambda n: cache.get(f"miss-{n}"), ops),
+                }
+                cache.set("counter", 0)
+                row["incr"] = timed(lambda n: cache.incr("counter"), ops)
+
+                # один и тот же счетчик из нескольких процессов
+                cache.set("shared-counter", 0, None)
+                per_process = ops // processes
+                workers = [
+                    multiprocessing.Process(
+                        target=incr_worker,
+                        args=(name, directory, per_process))
+                    for _ in range(processes)
+                ]
+                started = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - started
+                row["incr_multiprocess"] = per_process * processes / elapsed
+                # у LocMem счетчик в каждом процессе свой, родитель их не видит
+                row["shared_incr_correct"] = (
+                    cache.get("shared-counter") == per_process * processes)
+                results[name] = row
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        columns = ["set", "get_hit", "get_miss", "incr", "incr_multiprocess"]
+        self.stdout.write(f"{'backend':<10}"
+                          + "".join(f"{column:>18}" for column in columns)
+                          + f"{'shared incr':>13}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<10}"
+                + "".join(f"{row[column]:>16.0f}/s" for column in columns)
+                + f"{'yes' if row['shared_incr_correct'] else 'no':>13}")
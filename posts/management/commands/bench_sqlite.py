@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import percentile
+from yatube.db_backend.base import configure
+
+SCHEMA = """
+CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL,
+                   pub_date REAL NOT NULL, text TEXT NOT NULL);
+CREATE INDEX post_author_date ON post (author_id, pub_date);
+CREATE TABLE stats (user_id INTEGER PRIMARY KEY,
+                    posts_count INTEGER NOT NULL);
+"""
+AUTHORS = 100
+
+
+def setups():
+    """ Настройки соединения: как у стандартного бэкенда и наши """
+    return {
+        # django.db.backends.sqlite3: журнал отката, BEGIN DEFERRED и
+        # таймаут sqlite3 по умолчанию
+        "stock": {"pragmas": {}, "begin": "BEGIN", "timeout": 5.0},
+        "tuned": {"pragmas": settings.SQLITE_PRAGMAS,
+                  "begin": "BEGIN IMMEDIATE", "timeout": 5.0},
+    }
+
+
+def connect(path, setup):
+    conn = sqlite3.connect(path, timeout=setup["timeout"],
+                           isolation_level=None)
+    configure(conn, setup["pragmas"])
+    return conn
+
+
+def prepare(path, setup, rows):
+    conn = connect(path, setup)
+    conn.executescript(SCHEMA)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO post (author_id, pub_date, text) VALUES (?, ?, ?)",
+        ((number % AUTHORS, number, "текст записи " * 20)
+         for number in range(rows)))
+    conn.executemany("INSERT INTO stats VALUES (?, ?)",
+                     ((author, rows // AUTHORS)
+                      for author in range(AUTHORS)))
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def reader(path, setup, seconds, results):
+    """ Страница ленты автора, как в профиле """
+    conn = connect(path, setup)
+    done, errors = 0, 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            conn.execute(
+                "SELECT id, text FROM post WHERE author_id = ? "
+                "ORDER BY pub_date DESC LIMIT 10",
+                (random.randrange(AUTHORS),)).fetchall()
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(("read", done, errors, []))
+
+
+def writer(path, setup, seconds, results):
+    """ Новый пост со счетчиком автора: чтение, затем запись """
+    conn = connect(path, setup)
+    done, errors, latencies = 0, 0, []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        author = random.randrange(AUTHORS)
+        started = time.perf_counter()
+        try:
+            conn.execute(setup["begin"])
+            conn.execute("SELECT posts_count FROM stats WHERE user_id = ?",
+                         (author,)).fetchone()
+            conn.execute("INSERT INTO post (author_id, pub_date, text) "
+                         "VALUES (?, ?, ?)", (author, time.time(), "новый"))
+            conn.execute("UPDATE stats SET posts_count = posts_count + 1 "
+                         "WHERE user_id = ?", (author,))
+            conn.execute("COMMIT")
+            done += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+        except sqlite3.OperationalError:
+            # "database is locked": транзакция потеряна
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            errors += 1
+    results.put(("write", done, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность читателей и писателей "
+            "SQLite со стандартными настройками и с SQLITE_PRAGMAS и "
+            "BEGIN IMMEDIATE из yatube.db_backend")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4,
+                            help="читающих процессов")
+        parser.add_argument("--writers", type=int, default=2,
+                            help="пишущих процессов")
+        parser.add_argument("--seconds", type=float, default=5.0,
+                            help="длительность каждого замера")
+        parser.add_argument("--rows", type=int, default=50000,
+                            help="постов в базе перед замером")
+        parser.add_argument("--json", action="store_true",
+                            help="вывести результат в JSON")
+
+    def handle(self, *args, **options):
+        results = {name: self.measure(setup, options)
+                   for name, setup in setups().items()}
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        columns = ["reads_per_s", "writes_per_s", "read_errors",
+                   "write_errors", "write_p95_ms"]
+        self.stdout.write(f"{'setup':<8}"
+                          + "".join(f"{column:>15}" for column in columns))
+        for name, row in results.items():
+            self.stdout.write(f"{name:<8}" + "".join(
+                f"{row[column]:>15}" for column in columns))
+
+    def measure(self, setup, options):
+        directory = tempfile.mkdtemp(prefix="bench-sqlite-")
+        try:
+            path = os.path.join(directory, "bench.sqlite3")
+            prepare(path, setup, options["rows"])
+            queue = multiprocessing.Queue()
+            workers = (
+                [multiprocessing.Process(
+                    target=reader,
+                    args=(path, setup, options["seconds"], queue))
+                 for _ in range(options["readers"])]
+                + [multiprocessing.Process(
+                    target=writer,
+                    args=(path, setup, options["seconds"], queue))
+                   for _ in range(options["writers"])])
+            for worker in workers:
+                worker.start()
+            # результаты забираем до join: иначе процесс ждет, пока
+            # очередь освободится
+            rows = [queue.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        totals = {"read": [0, 0], "write": [0, 0]}
+        latencies = []
+        for kind, done, errors, times in rows:
+            totals[kind][0] += done
+            totals[kind][1] += errors
+            latencies += times
+        seconds = options["seconds"]
+        return {
+            "reads_per_s": round(totals["read"][0] / seconds),
+            "writes_per_s": round(totals["write"][0] / seconds),
+            "read_errors": totals["read"][1],
+            "write_errors": totals["write"][1],
+            "write_p95_ms": (round(percentile(latencies, 95), 2)
+                             if latencies else None),
+        }
@@ -0,0 +1,159 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts import benchmark
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=settings.BASE_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def change(old, new):
+    if not old:
+        return "    -"
+    return f"{(new - old) / old * 100:+5.0f}%"
+
+
+class Command(BaseCommand):
+    help = ("Замеряет страницы posts на наборах данных разного размера: "
+            "p50/p95/p99, время базы и шаблонов, число запросов. "
+            "Результат - JSON; --compare-ref сравнивает с другой веткой")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="размеры наборов (число постов) "
+                                 "через запятую")
+        parser.add_argument("--requests", type=int, default=50,
+                            help="замеров на каждую страницу")
+        parser.add_argument("--only", default="",
+                            help="сценарии через запятую, по умолчанию все")
+        parser.add_argument("--warm", action="store_true",
+                            help="не очищать кэш перед запросом")
+        parser.add_argument("--data-dir",
+                            default=os.path.join(tempfile.gettempdir(),
+                                                 "yatube-bench"),
+                            help="где хранить базы наборов между запусками")
+        parser.add_argument("--output", help="файл для JSON результата")
+        parser.add_argument("--compare",
+                            help="JSON прошлого запуска для сравнения")
+        parser.add_argument("--compare-ref",
+                            help="git-ветка или коммит: замерить его в "
+                                 "отдельном worktree и сравнить")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+        if options["compare_ref"]:
+            baseline = self.run_ref(options["compare_ref"], options)
+
+        # как в бою: без DEBUG не копятся connection.queries и отладка
+        # шаблонов не замедляет рендер
+        settings.DEBUG = False
+        os.makedirs(options["data_dir"], exist_ok=True)
+        report = {"commit": git_commit(), "requests": options["requests"],
+                  "cold_cache": not options["warm"], "sizes": {}}
+        only = {name for name in options["only"].split(",") if name}
+        for size in sizes:
+            path = os.path.join(options["data_dir"],
+                                f"bench-{size}.sqlite3")
+            info = self.use_dataset(path, size)
+            self.stderr.write(f"Замеры на {size} постах")
+            # new_post и add_comment пишут в базу: откатываем, чтобы
+            # следующий запуск мерил тот же набор
+            with transaction.atomic():
+                views = benchmark.measure(options["requests"],
+                                          cold=not options["warm"],
+                                          only=only)
+                transaction.set_rollback(True)
+            report["sizes"][str(size)] = {"dataset": info, "views": views}
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output)
+        elif baseline is None:
+            self.stdout.write(output)
+        if baseline is not None:
+            self.print_comparison(baseline, report)
+
+    def use_dataset(self, path, size):
+        """ Переключает соединение на базу набора, создает её при нужде """
+        connection.close()
+        connection.settings_dict["NAME"] = path
+        info = benchmark.dataset_info(path)
+        if info is not None and info.get("size") == size:
+            # схема могла измениться с прошлого запуска
+            call_command("migrate", verbosity=0)
+            return info
+        for stale in (path, path + ".json"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        call_command("migrate", verbosity=0)
+        self.stderr.write(f"Создаю набор на {size} постов в {path}")
+        return benchmark.generate(size, path, log=self.stderr.write)
+
+    def run_ref(self, ref, options):
+        """ Тот же замер в чистом worktree другой ветки """
+        directory = tempfile.mkdtemp(prefix="yatube-bench-ref-")
+        output = os.path.join(directory, "result.json")
+        worktree = os.path.join(directory, "tree")
+        data_dir = os.path.join(options["data_dir"],
+                                "ref-" + re.sub(r"\W", "_", ref))
+        try:
+            subprocess.run(["git", "worktree", "add", "--detach", worktree,
+                            ref], check=True, cwd=settings.BASE_DIR)
+        except (OSError, subprocess.CalledProcessError) as error:
+            raise CommandError(f"Не удалось получить {ref}: {error}")
+        try:
+            command = [sys.executable, "manage.py", "bench_views",
+                       "--sizes", options["sizes"],
+                       "--requests", str(options["requests"]),
+                       "--data-dir", data_dir, "--output", output]
+            if options["only"]:
+                command += ["--only", options["only"]]
+            if options["warm"]:
+                command.append("--warm")
+            subprocess.run(command, check=True, cwd=worktree)
+            with open(output, encoding="utf-8") as file:
+                return json.load(file)
+        except subprocess.CalledProcessError as error:
+            raise CommandError(f"Замер {ref} не удался: {error}")
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force",
+                            worktree], cwd=settings.BASE_DIR)
+
+    def print_comparison(self, baseline, report):
+        self.stdout.write(f"{baseline.get('commit')} -> {report['commit']}")
+        header = (f"{'размер':>8} {'страница':<20} {'p50, мс':>18} "
+                  f"{'p95, мс':>18} {'запросов':>10}")
+        self.stdout.write(header)
+        for size, current in report["sizes"].items():
+            old_views = baseline["sizes"].get(size, {}).get("views", {})
+            for name, new in current["views"].items():
+                old = old_views.get(name)
+                if old is None:
+                    continue
+                self.stdout.write(
+                    f"{size:>8} {name:<20} "
+                    f"{old['p50_ms']:>6.1f}>{new['p50_ms']:<6.1f}"
+                    f"{change(old['p50_ms'], new['p50_ms'])} "
+                    f"{old['p95_ms']:>6.1f}>{new['p95_ms']:<6.1f}"
+                    f"{change(old['p95_ms'], new['p95_ms'])} "
+                    f"{old['queries']:>4}>{new['queries']:<4}")
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+class Command(BaseCommand):
+    help = ("Обслуживание SQLite: ANALYZE, инкрементальный VACUUM и "
+            "контрольная точка WAL. Запускать по расписанию, например "
+            "раз в час")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--skip-analyze", action="store_true")
+        parser.add_argument("--skip-vacuum", action="store_true")
+        parser.add_argument("--skip-checkpoint", action="store_true")
+        parser.add_argument("--vacuum-pages", type=int, default=0,
+                            help="сколько свободных страниц вернуть, "
+                                 "0 - все")
+        parser.add_argument("--checkpoint-mode", default="TRUNCATE",
+                            choices=CHECKPOINT_MODES,
+                            help="TRUNCATE еще и обрезает файл -wal")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError("dbmaintain обслуживает только SQLite")
+        with connection.cursor() as cursor:
+            self.cursor = cursor
+            self.raw = connection.connection
+            if not options["skip_analyze"]:
+                self.analyze()
+            if not options["skip_vacuum"]:
+                self.vacuum(options["vacuum_pages"])
+            if not options["skip_checkpoint"]:
+                self.checkpoint(options["checkpoint_mode"])
+
+    def pragma(self, name):
+        self.cursor.execute(f"PRAGMA {name}")
+        return self.cursor.fetchone()[0]
+
+    def timed(self, label, sql, script=False):
+        started = time.monotonic()
+        if script:
+            # PRAGMA incremental_vacuum освобождает по странице за шаг,
+            # а execute делает только первый: executescript идет до конца
+            self.raw.executescript(sql)
+            rows = []
+        else:
+            self.cursor.execute(sql)
+            rows = self.cursor.fetchall()
+        self.stdout.write(
+            f"{label}: {(time.monotonic() - started) * 1000:.0f} мс")
+        return rows
+
+    def analyze(self):
+        """ Статистика индексов для планировщика запросов """
+        self.timed("ANALYZE", "ANALYZE")
+
+    def vacuum(self, pages):
+        """ Возвращает свободные страницы файла системе """
+        free = self.pragma("freelist_count")
+        if self.pragma("auto_vacuum") != 2:
+            # режим сменится только после полного VACUUM, дальше хватит
+            # инкрементального
+            self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.timed("VACUUM (включение auto_vacuum=INCREMENTAL)",
+                       "VACUUM")
+        else:
+            self.timed(f"incremental_vacuum({pages})",
+                       f"PRAGMA incremental_vacuum({int(pages)})",
+                       script=True)
+        self.stdout.write(f"  свободных страниц: {free} -> "
+                          f"{self.pragma('freelist_count')}, "
+                          f"всего: {self.pragma('page_count')}")
+
+    def checkpoint(self, mode):
+        """ Переносит WAL в основной файл, чтобы -wal не рос """
+        if self.pragma("journal_mode") != "wal":
+            self.stdout.write("Контрольная точка не нужна: база не в WAL")
+            return
+        (busy, log, done), = self.timed(f"wal_checkpoint({mode})",
+                                        f"PRAGMA wal_checkpoint({mode})")
+        self.stdout.write(f"  страниц в WAL: {log}, перенесено: {done}"
+                          + (", часть занята читателями" if busy else ""))
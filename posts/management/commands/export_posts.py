@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import FIELDS, export
+
+
+class Command(BaseCommand):
+    help = ("Выгружает посты, комментарии и подписки в JSONL или CSV "
+            "потоком, не загружая таблицы в память")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-",
+                            help="файл для выгрузки или - для stdout")
+        parser.add_argument("--format", choices=["jsonl", "csv"],
+                            default="jsonl")
+        parser.add_argument("--type", action="append", choices=list(FIELDS),
+                            dest="kinds",
+                            help="вид записей, можно несколько раз; "
+                                 "по умолчанию все (для CSV - один)")
+        parser.add_argument("--gzip", action="store_true",
+                            help="сжать выгрузку gzip")
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="строк в одном запросе к базе")
+
+    def handle(self, *args, **options):
+        kinds = options["kinds"] or list(FIELDS)
+        try:
+            chunks = export(kinds, options["format"], options["gzip"],
+                            chunk_size=options["chunk_size"])
+        except ValueError as error:
+            raise CommandError(error)
+        path = options["path"]
+        output = (sys.stdout.buffer if path == "-"
+                  else open(path, "wb"))
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if path != "-":
+                output.close()
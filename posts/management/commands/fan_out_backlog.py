@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = ("Раскладывает по лентам посты авторов, которые снова "
+            "уложились в FEED_FANOUT_LIMIT подписчиков")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="строк ленты в одной пачке")
+
+    def handle(self, *args, **options):
+        written = feed.drain_backlog(batch_size=options["batch_size"])
+        self.stdout.write(f"Разложено записей: {written}")
@@ -0,0 +1,100 @@
+import gzip
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts.importer import KINDS, Importer, read_csv, read_jsonl
+from posts.models import Comment, Post
+
+
+def open_input(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "jsonl"
+
+
+class Command(BaseCommand):
+    help = ("Импортирует посты, комментарии и подписки из JSONL или CSV "
+            "пачками через bulk_create. Память не растет с размером файла")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="файл .jsonl/.csv (можно .gz) "
+                                         "или - для stdin")
+        parser.add_argument("--format", choices=["jsonl", "csv"],
+                            help="по умолчанию - по расширению файла")
+        parser.add_argument("--type", choices=KINDS, default="post",
+                            help="вид записей в CSV; в JSONL - поле type")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="записей в одном bulk_create")
+        parser.add_argument("--batches-per-transaction", type=int,
+                            default=10,
+                            help="пачек в одной транзакции")
+        parser.add_argument("--create-missing", action="store_true",
+                            help="создавать неизвестных авторов и "
+                                 "сообщества вместо пропуска записи")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        self.verbosity = options["verbosity"]
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля")
+        data_format = options["format"] or guess_format(path)
+        try:
+            stream = open_input(path)
+        except OSError as error:
+            raise CommandError(error)
+
+        with stream:
+            importer = Importer(batch_size=options["batch_size"],
+                                create_missing=options["create_missing"])
+            # испорченные строки пропускаются и считаются, а не прерывают
+            # импорт
+            if data_format == "csv":
+                records = read_csv(stream, options["type"],
+                                   on_error=importer.skip)
+            else:
+                records = read_jsonl(stream, on_error=importer.skip)
+            per_transaction = (options["batch_size"]
+                               * options["batches_per_transaction"])
+            self.started = time.monotonic()
+            done = False
+            while not done:
+                # транзакция на несколько пачек: сбой откатывает только их
+                with transaction.atomic():
+                    for read, record in enumerate(records, 1):
+                        importer.add(record)
+                        if read >= per_transaction:
+                            break
+                    else:
+                        done = True
+                    importer.flush()
+                self.report(importer.counts)
+
+        # явные id не сдвигают последовательности postgres - выставим их
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(),
+                                                         [Post, Comment]):
+                cursor.execute(sql)
+        self.report(importer.counts, final=True)
+
+    def report(self, counts, final=False):
+        if self.verbosity < 1 and not final:
+            return
+        elapsed = time.monotonic() - self.started
+        imported = counts["posts"] + counts["comments"] + counts["follows"]
+        self.stdout.write(
+            ("Готово: " if final else "")
+            + f"постов {counts['posts']}, комментариев {counts['comments']}, "
+            f"подписок {counts['follows']}, пропущено {counts['skipped']} "
+            f"({imported / elapsed if elapsed else 0:.0f} записей/с)")
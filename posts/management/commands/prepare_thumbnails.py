@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ("Готовит варианты картинок карточек для постов, у которых их "
+            "нет (например, после сбоя фоновой нарезки)")
+
+    def handle(self, *args, **options):
+        post_ids = (Post.objects.exclude(image="").exclude(image=None)
+                    .filter(card_images="").order_by()
+                    .values_list("pk", flat=True))
+        prepared = thumbnails.prepare_missing(list(post_ids))
+        self.stdout.write(f"Подготовлено картинок: {prepared}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Сверяет Post.comments_count с фактическим числом комментариев"
+
+    def handle(self, *args, **options):
+        actual = (Comment.objects.filter(post=OuterRef("pk"))
+                  .order_by()
+                  .values("post")
+                  .annotate(total=Count("pk"))
+                  .values("total"))
+        actual = Coalesce(Subquery(actual, output_field=IntegerField()), 0)
+        drifted = (Post.objects.annotate(actual=actual)
+                   .exclude(comments_count=actual))
+        fixed = Post.objects.filter(
+            pk__in=drifted.values("pk")
+        ).update(comments_count=actual)
+        self.stdout.write(f"Исправлено счетчиков: {fixed}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс постов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="постов в одной пачке вставки")
+
+    def handle(self, *args, **options):
+        total = get_backend().reindex(Post.objects.all(),
+                                      batch_size=options["batch_size"])
+        self.stdout.write(f"Проиндексировано постов: {total}")
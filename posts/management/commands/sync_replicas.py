@@ -0,0 +1,52 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from posts import generations
+
+
+def sync_replica(alias, path):
+    """ Копирует default в файл реплики через backup API SQLite
+
+    Копия согласована: backup читает default одним снимком, а читатели
+    реплики видят либо старую, либо новую копию целиком.
+    """
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+        # реплика открывается только для чтения: без WAL ей не нужен
+        # файл -shm рядом
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+    # фрагменты лент, собранные со старой копии, больше не подходят
+    generations.bump(f"replica:{alias}")
+
+
+class Command(BaseCommand):
+    help = "Обновляет реплики базы (DATABASE_REPLICAS) копией default"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0,
+                            help="повторять каждые столько секунд")
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != "sqlite":
+            raise CommandError("Копировать файлом можно только SQLite")
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("Реплики не заданы: YATUBE_DB_REPLICAS")
+        while True:
+            for alias, path in settings.DATABASE_REPLICAS.items():
+                started = time.monotonic()
+                sync_replica(alias, path)
+                self.stdout.write(
+                    f"{alias}: {path} за "
+                    f"{(time.monotonic() - started) * 1000:.0f} мс")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ("Добавляет в рейтинг популярных постов новые посты, "
+            "комментарии и подписки")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="пересчитать рейтинг всех постов заново")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--interval", type=float, default=0,
+                            help="повторять каждые столько секунд")
+
+    def handle(self, *args, **options):
+        full = options["full"]
+        while True:
+            started = time.monotonic()
+            result = trending.update(full=full,
+                                     batch_size=options["batch_size"])
+            self.stdout.write(
+                f"Новых постов: {result['post']}, "
+                f"изменилось рейтингов: {result['changed']} за "
+                f"{(time.monotonic() - started) * 1000:.0f} мс")
+            if not options["interval"]:
+                break
+            # полный пересчет нужен один раз, дальше - только новые события
+            full = False
+            time.sleep(options["interval"])
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    """ Заполняем счетчик для уже существующих постов """
+    Comment = apps.get_model("posts", "Comment")
+    Post = apps.get_model("posts", "Post")
+    actual = (Comment.objects.filter(post=OuterRef("pk"))
+              .order_by()
+              .values("post")
+              .annotate(total=Count("pk"))
+              .values("total"))
+    Post.objects.update(comments_count=Coalesce(
+        Subquery(actual, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
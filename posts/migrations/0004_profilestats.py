@@ -0,0 +1,46 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    """ Считаем счетчики для уже существующих пользователей """
+    app_label, model_name = settings.AUTH_USER_MODEL.split(".")
+    User = apps.get_model(app_label, model_name)
+    ProfileStats = apps.get_model("posts", "ProfileStats")
+    users = User.objects.annotate(
+        posts_total=models.Count("posts", distinct=True),
+        followers_total=models.Count("following", distinct=True),
+        following_total=models.Count("follower", distinct=True),
+    )
+    ProfileStats.objects.bulk_create(
+        [ProfileStats(user_id=user.pk,
+                      posts_count=user.posts_total,
+                      followers_count=user.followers_total,
+                      following_count=user.following_total)
+         for user in users.iterator()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0003_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписан')),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def segment(pk, width=8):
+    digits = ""
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"[digit] + digits
+    return digits.rjust(width, "0")
+
+
+def fill_root_paths(apps, schema_editor):
+    """ До веток все комментарии - корневые: путь из одного id """
+    Comment = apps.get_model("posts", "Comment")
+    updates = [Comment(pk=pk, path=segment(pk))
+               for pk in Comment.objects.values_list("pk", flat=True)]
+    Comment.objects.bulk_update(updates, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_created_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=128, verbose_name='Путь в ветке'),
+        ),
+        migrations.RunPython(fill_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+    ]
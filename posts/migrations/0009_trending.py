@@ -0,0 +1,41 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCursor',
+            fields=[
+                ('source', models.CharField(max_length=20, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('last_id', models.PositiveIntegerField(default=0, verbose_name='Последний учтенный id')),
+            ],
+        ),
+        # сначала без auto_now_add: иначе существующие подписки получат
+        # дату миграции и update_trending учтет их как новые
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(null=True, verbose_name='Дата подписки'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата подписки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Рейтинг популярности'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ),
+    ]
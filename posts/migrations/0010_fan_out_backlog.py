@@ -0,0 +1,43 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remember_large_authors(apps, schema_editor):
+    """ Что пропущено у уже популярных авторов, неизвестно - раскладываем
+    им все посты, когда они уложатся в лимит """
+    Follow = apps.get_model("posts", "Follow")
+    FanOutBacklog = apps.get_model("posts", "FanOutBacklog")
+    authors = (Follow.objects.values("author_id")
+               .annotate(followers=models.Count("pk"))
+               .filter(followers__gt=settings.FEED_FANOUT_LIMIT)
+               .values_list("author_id", flat=True))
+    FanOutBacklog.objects.bulk_create(
+        [FanOutBacklog(author_id=author_id, post_id=0, follow_id=0)
+         for author_id in authors.iterator()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanOutBacklog',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fan_out_backlog', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_id', models.PositiveIntegerField(verbose_name='Последний разложенный пост')),
+                ('follow_id', models.PositiveIntegerField(verbose_name='Последняя разложенная подписка')),
+                ('last_post_id', models.PositiveIntegerField(default=0, verbose_name='Курсор раскладки')),
+            ],
+        ),
+        migrations.RunPython(remember_large_authors,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_fan_out_backlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='card_images',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Варианты картинки'),
+        ),
+    ]
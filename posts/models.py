@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from . import threads
 
 User = get_user_model()
 
@@ -12,24 +14,60 @@ class Post(models.Model):
     pub_date = models.DateTimeField(verbose_name="Дата публикации",
                                     auto_now_add=True)
 
+    # отдельные индексы по author и group не нужны: эти поля - первые
+    # в составных индексах из Meta.indexes
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="posts",
-                               verbose_name="Автор")
+                               verbose_name="Автор",
+                               db_index=False)
     # создаем связь поста с сообществом
     group = models.ForeignKey("Group", on_delete=models.SET_NULL,
                               blank=True,
                               null=True,
                               related_name="posts",
                               verbose_name="Сообщество",
-                              help_text="Название сообщества")
+                              help_text="Название сообщества",
+                              db_index=False)
 
     image = models.ImageField(upload_to="posts/",
                               verbose_name="Картинка",
                               help_text="Картинка к посту",
                               blank=True, null=True)
+    # размеры исходной картинки запоминаются при загрузке, чтобы не
+    # открывать файл ради них (см. posts.forms.PostForm)
+    image_width = models.PositiveIntegerField(
+        verbose_name="Ширина картинки", blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        verbose_name="Высота картинки", blank=True, null=True, editable=False)
+    # нарезанные варианты картинки для карточки - JSON из posts.thumbnails;
+    # пустая строка - варианты еще не готовы
+    card_images = models.TextField(
+        verbose_name="Варианты картинки", blank=True, default="",
+        editable=False)
+    # счетчик поддерживается сигналами Comment, сверка - reconcile_comments
+    comments_count = models.PositiveIntegerField(
+        verbose_name="Комментариев", default=0, editable=False)
+    # пересчитывается командой update_trending (см. posts.trending),
+    # пустой - пост еще не попал в рейтинг
+    trending_score = models.FloatField(
+        verbose_name="Рейтинг популярности", blank=True, null=True,
+        editable=False)
 
     class Meta:
         ordering = ["-pub_date"]
+        # ленты сортируются по (pub_date, id) - индексы отдают строки уже
+        # в этом порядке, без сортировки во временном B-дереве
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"],
+                         name="post_date_idx"),
+            models.Index(fields=["author", "-pub_date", "-id"],
+                         name="post_author_date_idx"),
+            models.Index(fields=["group", "-pub_date", "-id"],
+                         name="post_group_date_idx"),
+            # /trending/ - первые строки этого индекса
+            models.Index(fields=["-trending_score", "-id"],
+                         name="post_trending_idx"),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -52,9 +90,13 @@ class Group(models.Model):
 
 
 class Comment(models.Model):
-    """ Описание модели комментария """
+    """ Описание модели комментария
+
+    Ответы образуют ветки: path хранит id всех предков (см. posts.threads),
+    поэтому ветка читается одним диапазонным запросом по индексу.
+    """
     post = models.ForeignKey("Post", on_delete=models.CASCADE,
-                             related_name="comments")
+                             related_name="comments", db_index=False)
 
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="comment",
@@ -66,6 +108,43 @@ class Comment(models.Model):
     created = models.DateTimeField(verbose_name="Дата комментария",
                                    auto_now_add=True)
 
+    parent = models.ForeignKey("self", on_delete=models.CASCADE,
+                               blank=True, null=True,
+                               related_name="replies",
+                               verbose_name="Ответ на")
+    # заполняется при сохранении, пустой только до второй записи
+    path = models.CharField(verbose_name="Путь в ветке", editable=False,
+                            max_length=threads.SEGMENT * threads.MAX_DEPTH,
+                            default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "path"],
+                         name="comment_post_path_idx"),
+        ]
+
+    @property
+    def depth(self):
+        return threads.depth(self.path)
+
+    def save(self, *args, **kwargs):
+        """ Путь зависит от id, поэтому новый комментарий пишется дважды """
+        if self.path:
+            return super().save(*args, **kwargs)
+        parent_path = ""
+        if self.parent_id:
+            parent = self.parent
+            if parent.depth + 1 >= threads.MAX_DEPTH:
+                # слишком глубоко: отвечаем рядом с родителем
+                self.parent = parent.parent
+                parent_path = parent.path[:-threads.SEGMENT]
+            else:
+                parent_path = parent.path
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            self.path = threads.child_path(parent_path, self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Follow(models.Model):
     """ Модель для хранения подписок я - user подписываюсь на author """
@@ -74,9 +153,107 @@ class Follow(models.Model):
 
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="following")
-    # TODO выдает ошибки
-    # class Meta:
-    #     constraints = [
-    #         models.UniqueConstraint(fields=["user", "author"],
-    #                                 name="follow-constraint")
-    #     ]
+    # у подписок, созданных до 0009, даты нет
+    created = models.DateTimeField(verbose_name="Дата подписки",
+                                   auto_now_add=True, null=True)
+
+    class Meta:
+        # повторные подписки удалены миграцией 0007
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="follow-constraint")
+        ]
+
+
+class FeedEntry(models.Model):
+    """ Материализованная лента подписок: запись на каждый пост автора,
+    на которого подписан user. Заполняется при сохранении поста """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+
+    post = models.ForeignKey("Post", on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    # дублируем автора и дату, чтобы чистить и сортировать ленту по индексу
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"],
+                                    name="feed-entry-constraint")
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"],
+                         name="feed_user_date_post_idx"),
+            models.Index(fields=["user", "author"],
+                         name="feed_user_author_idx"),
+        ]
+
+
+class FanOutBacklog(models.Model):
+    """ Посты популярного автора, которые не разложены по лентам
+
+    Пока у автора больше FEED_FANOUT_LIMIT подписчиков, его новые посты
+    и посты для новых подписчиков не раскладываются, а читаются из Post.
+    Строка живет, пока команда fan_out_backlog не разложит их после того,
+    как автор снова уложится в лимит; до тех пор лента подписок читает
+    автора напрямую.
+    """
+    author = models.OneToOneField(User, on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name="fan_out_backlog")
+    # посты с большим id не попали в ленты подписчиков
+    post_id = models.PositiveIntegerField("Последний разложенный пост")
+    # подписчики с большим id подписки не получили старые посты
+    follow_id = models.PositiveIntegerField("Последняя разложенная подписка")
+    # до какого поста уже дошла команда fan_out_backlog
+    last_post_id = models.PositiveIntegerField("Курсор раскладки", default=0)
+
+
+class ProfileStats(models.Model):
+    """ Счетчики профиля: записи, подписчики, подписки
+
+    Поддерживаются сигналами атомарными инкрементами, поэтому шапка
+    профиля читается вместе с пользователем одним запросом.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+
+    posts_count = models.PositiveIntegerField("Записей", default=0)
+
+    followers_count = models.PositiveIntegerField("Подписчиков", default=0)
+
+    following_count = models.PositiveIntegerField("Подписан", default=0)
+
+    @classmethod
+    def for_user(cls, user):
+        """ Счетчики пользователя, при отсутствии считаются заново """
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            stats, _ = cls.objects.get_or_create(user=user, defaults={
+                "posts_count": user.posts.count(),
+                "followers_count": user.following.count(),
+                "following_count": user.follower.count(),
+            })
+            return stats
+
+    @classmethod
+    def increment(cls, user_id, field, delta=1):
+        """ Атомарно меняет счетчик на delta без чтения строки """
+        stats = cls.objects.filter(user_id=user_id)
+        if delta < 0:
+            stats = stats.filter(**{f"{field}__gte": -delta})
+        stats.update(**{field: models.F(field) + delta})
+
+
+class TrendingCursor(models.Model):
+    """ До какого id update_trending уже учел посты, комментарии и подписки
+
+    Следующий запуск читает только строки с большими id.
+    """
+    source = models.CharField("Таблица", max_length=20, primary_key=True)
+
+    last_id = models.PositiveIntegerField("Последний учтенный id", default=0)
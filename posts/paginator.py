@@ -0,0 +1,149 @@
+""" Курсорная (keyset) пагинация лент
+
+Вместо COUNT(*) и OFFSET страница выбирается условием по паре
+(pub_date, id) от последней показанной записи, поэтому глубокие страницы
+стоят столько же, сколько первая.
+"""
+import base64
+from collections.abc import Sequence
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(pub_date, pk):
+    """ Упаковывает ключ записи в строку для адресной строки """
+    raw = f"{pub_date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """ Распаковывает курсор, для битого курсора возвращает None """
+    if not cursor:
+        return None
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        date_value, pk = raw.rsplit("|", 1)
+        pub_date = parse_datetime(date_value)
+        if pub_date is None:
+            return None
+        return pub_date, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def merge_sources(sources, keys, descending=True):
+    """ Объединяет части ленты в один упорядоченный по ключу запрос """
+    if not isinstance(sources, (list, tuple)):
+        return sources
+    merged = sources[0].order_by()
+    if len(sources) > 1:
+        merged = merged.union(*[part.order_by() for part in sources[1:]])
+    prefix = "-" if descending else ""
+    return merged.order_by(*[f"{prefix}{key}" for key in keys])
+
+
+class CursorPage(Sequence):
+    """ Страница курсорного паджинатора, повторяет интерфейс Page
+
+    Курсоры считаются сразу, поэтому object_list можно заменить
+    (например, гидрировать id в посты) без потери ссылок на соседей.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        # repr попадает в ключ кэша фрагмента, поэтому включает курсоры
+        return f"<CursorPage {self.previous_cursor}..{self.next_cursor}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """ Паджинатор по ключу (pub_date, id) без COUNT(*) и OFFSET
+
+    object_list - упорядоченный по убыванию ключа запрос или список
+    запросов-частей, которые объединяются через union после фильтрации.
+    """
+
+    def __init__(self, object_list, per_page, keys=("pub_date", "id")):
+        self.sources = (list(object_list)
+                        if isinstance(object_list, (list, tuple))
+                        else [object_list])
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def _filtered(self, cursor, older):
+        date_key, pk_key = self.keys
+        pub_date, pk = cursor
+        lookup = "lt" if older else "gt"
+        # то же, что date < d OR (date = d AND pk < p), но с условием
+        # date <= d отдельно: по нему база ищет в индексе диапазон, а не
+        # просматривает индекс с начала
+        condition = (Q(**{f"{date_key}__{lookup}e": pub_date})
+                     & (Q(**{f"{date_key}__{lookup}": pub_date})
+                        | Q(**{f"{pk_key}__{lookup}": pk})))
+        return [source.filter(condition) for source in self.sources]
+
+    def _fetch(self, sources, older, limit=None):
+        # берем на одну запись больше, чтобы узнать, есть ли следующая
+        if limit is None:
+            limit = self.per_page + 1
+        merged = merge_sources(sources, self.keys, descending=older)
+        return list(merged[:limit])
+
+    def get_page(self, after=None, before=None):
+        """ Страница старше курсора after или новее курсора before """
+        after_key = decode_cursor(after)
+        before_key = decode_cursor(before)
+        if before_key:
+            rows = self._fetch(self._filtered(before_key, older=False),
+                               older=False)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            # записи за курсором могли удалить - проверяем по одной строке
+            has_next = bool(rows) and bool(self._fetch(
+                self._filtered(self._key(rows[-1]), older=True),
+                older=True, limit=1))
+        else:
+            sources = self.sources
+            if after_key:
+                sources = self._filtered(after_key, older=True)
+            rows = self._fetch(sources, older=True)
+            has_next = len(rows) > self.per_page
+            has_previous = after_key is not None
+            rows = rows[:self.per_page]
+
+        if not rows:
+            return CursorPage(rows, self)
+        return CursorPage(
+            rows, self,
+            next_cursor=self._cursor(rows[-1]) if has_next else None,
+            previous_cursor=self._cursor(rows[0]) if has_previous else None)
+
+    def _key(self, obj):
+        date_key, pk_key = self.keys
+        return getattr(obj, date_key), getattr(obj, pk_key)
+
+    def _cursor(self, obj):
+        return encode_cursor(*self._key(obj))
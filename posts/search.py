@@ -0,0 +1,170 @@
+""" Полнотекстовый поиск по постам
+
+Бэкенд выбирается настройкой SEARCH_BACKEND. На SQLite индекс хранится
+в виртуальной таблице FTS5, поэтому поиск не сканирует posts_post и его
+время почти не зависит от числа постов. Индекс обновляется сигналами при
+сохранении и удалении поста, полная перестройка - reindex_posts.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+# служебные символы вокруг совпадений до экранирования html
+MARK_START, MARK_END = "\x02", "\x03"
+
+FTS_TABLE = "posts_post_fts"
+
+
+def highlight(snippet):
+    """ Экранирует фрагмент и выделяет совпадения тегом <mark> """
+    return (escape(snippet)
+            .replace(MARK_START, "<mark>")
+            .replace(MARK_END, "</mark>"))
+
+
+class SearchResult:
+    def __init__(self, post_id, rank, snippet):
+        self.post_id = post_id
+        self.rank = rank
+        self.snippet = snippet
+        self.post = None
+
+
+class BaseSearchBackend:
+    """ Интерфейс бэкенда поиска """
+
+    def index(self, post):
+        raise NotImplementedError
+
+    def index_many(self, posts):
+        for post in posts:
+            self.index(post)
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def search(self, query, limit=10, offset=0):
+        """ Список SearchResult, лучшие совпадения первыми """
+        raise NotImplementedError
+
+    def reindex(self, posts, batch_size=1000):
+        """ Перестраивает индекс, возвращает число проиндексированных """
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """ Запасной бэкенд для баз без полнотекстового индекса: LIKE-поиск """
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def search(self, query, limit=10, offset=0):
+        words = query.split()
+        if not words:
+            return []
+        posts = Post.objects.all()
+        for word in words:
+            posts = posts.filter(text__icontains=word)
+        return [SearchResult(pk, 0, escape(text[:200]))
+                for pk, text in posts.values_list(
+                    "pk", "text")[offset:offset + limit]]
+
+    def reindex(self, posts, batch_size=1000):
+        return 0
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """ Индекс FTS5: ранжирование bm25 и фрагменты через snippet() """
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                           [post.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)",
+                [post.pk, post.text])
+
+    def index_many(self, posts):
+        """ Пачка постов: по одному executemany на удаление и вставку """
+        rows = [(post.pk, post.text) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [(pk,) for pk, _ in rows])
+            self._insert(cursor, rows)
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                           [post_id])
+
+    @staticmethod
+    def match_expression(query):
+        """ Слова запроса как фразы FTS5, последнее - по префиксу """
+        words = re.findall(r"\w+", query)
+        if not words:
+            return None
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+    def search(self, query, limit=10, offset=0):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, rank, "
+                f"snippet({FTS_TABLE}, 0, %s, %s, '…', 16) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY rank LIMIT %s OFFSET %s",
+                [MARK_START, MARK_END, expression, limit, offset])
+            return [SearchResult(post_id, rank, highlight(snippet))
+                    for post_id, rank, snippet in cursor.fetchall()]
+
+    def reindex(self, posts, batch_size=1000):
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch = []
+            for row in posts.order_by().values_list("pk", "text").iterator(
+                    chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    total += self._insert(cursor, batch)
+                    batch = []
+            total += self._insert(cursor, batch)
+            # сливаем сегменты индекса после массовой вставки
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return total
+
+    @staticmethod
+    def _insert(cursor, rows):
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)",
+                rows)
+        return len(rows)
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search_posts(query, limit=10, offset=0):
+    """ Результаты поиска с постами, загруженными одним запросом """
+    results = get_backend().search(query, limit=limit, offset=offset)
+    posts = Post.objects.select_related("author", "group").in_bulk(
+        [result.post_id for result in results])
+    for result in results:
+        result.post = posts.get(result.post_id)
+    return [result for result in results if result.post is not None]
@@ -0,0 +1,117 @@
+""" Обработчики сигналов моделей posts """
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed, generations, search
+from .models import Comment, Follow, Group, Post, ProfileStats
+
+
+@receiver(post_save, sender=get_user_model())
+def user_created(sender, instance, created, raw=False, **kwargs):
+    """ Заводит счетчики профиля новому пользователю """
+    if created and not raw:
+        ProfileStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    """ Название и описание видны в шапке ленты сообщества
+
+    Название и адрес есть и в карточках постов сообщества: они устаревают
+    на главной (и в ленте подписок, и в популярном - у них то же
+    поколение "index") и в профилях авторов этих постов.
+    """
+    if raw:
+        return
+    if created:
+        generations.bump(f"group:{instance.pk}")
+        return
+    author_ids = Post.objects.filter(group=instance).order_by().values_list(
+        "author_id", flat=True).distinct()
+    generations.bump(f"group:{instance.pk}", "index",
+                     *(f"profile:{author_id}" for author_id in author_ids))
+
+
+@receiver(pre_save, sender=Post)
+def post_moving(sender, instance, raw=False, **kwargs):
+    """ Пост перенесли в другое сообщество - старая лента устарела """
+    if raw or instance.pk is None:
+        return
+    old_group_id = Post.objects.filter(pk=instance.pk).values_list(
+        "group_id", flat=True).first()
+    if old_group_id and old_group_id != instance.group_id:
+        generations.bump(f"group:{old_group_id}")
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    """ Раскладывает пост по лентам подписчиков """
+    if raw:
+        return
+    generations.bump(*generations.post_scopes(instance.author_id,
+                                              instance.group_id))
+    search.get_backend().index(instance)
+    if created:
+        ProfileStats.increment(instance.author_id, "posts_count")
+        feed.fan_out_post(instance)
+    else:
+        feed.update_post_date(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    """ Новая подписка - докладываем посты автора в ленту """
+    if created and not raw:
+        ProfileStats.increment(instance.author_id, "followers_count")
+        ProfileStats.increment(instance.user_id, "following_count")
+        feed.forget_follow_set(instance.user_id)
+        generations.bump(*generations.follow_scopes(instance.user_id,
+                                                    instance.author_id))
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """ Отписка - убираем посты автора из ленты """
+    ProfileStats.increment(instance.author_id, "followers_count", -1)
+    ProfileStats.increment(instance.user_id, "following_count", -1)
+    feed.forget_follow_set(instance.user_id)
+    generations.bump(*generations.follow_scopes(instance.user_id,
+                                                instance.author_id))
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """ Уменьшает счетчик записей автора и убирает пост из поиска """
+    ProfileStats.increment(instance.author_id, "posts_count", -1)
+    search.get_backend().remove(instance.pk)
+    generations.bump(*generations.post_scopes(instance.author_id,
+                                              instance.group_id))
+
+
+def bump_comment_feeds(comment):
+    """ Счетчик комментариев виден в карточке поста во всех лентах """
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        "author_id", "group_id").first()
+    if post:
+        generations.bump(*generations.post_scopes(*post))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    """ Увеличивает счетчик комментариев поста """
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F("comments_count") + 1)
+        bump_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """ Уменьшает счетчик, в том числе при каскадном удалении """
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F("comments_count") - 1)
+    bump_comment_feeds(instance)
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def card_images(post):
+    """ Готовые варианты картинки карточки или None, файл не открывает """
+    return thumbnails.ready_card_images(post)
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from yatube.testing import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class TestFeedApi(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.group = Group.objects.create(title="Программисты", slug="dev")
+        for number in range(15):
+            Post.objects.create(text=f"Запись {number}", author=cls.author,
+                                group=cls.group if number % 2 else None)
+        cls.post = Post.objects.create(text="Свежая", author=cls.author,
+                                       group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text="Комментарий")
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, name, kwargs=None, **params):
+        """ Ответ API в пределах бюджета запросов из QUERY_BUDGETS_FILE """
+        response = self.assertWithinQueryBudget(
+            self.client, reverse(f"posts:{name}", kwargs=kwargs), params)
+        return response.json()
+
+    def test_index_pages(self):
+        """ Курсоры проходят ленту без повторов """
+        first = self.get("api_index")
+        self.assertEqual(len(first["results"]), 10)
+        self.assertIsNone(first["previous"])
+        latest = first["results"][0]
+        self.assertEqual(
+            (latest["id"], latest["author"], latest["group"],
+             latest["comments_count"]),
+            (self.post.pk, "author", "dev", 1))
+        second = self.get("api_index", after=first["next"], limit=50)
+        self.assertEqual(len(second["results"]), 6)
+        self.assertIsNone(second["next"])
+        ids = [post["id"] for post in first["results"] + second["results"]]
+        self.assertEqual(len(set(ids)), 16)
+
+    def test_group_and_profile(self):
+        data = self.get("api_group", {"slug": "dev"}, limit=50)
+        self.assertEqual(data["group"]["title"], "Программисты")
+        self.assertEqual(len(data["results"]), 8)
+        data = self.get("api_profile", {"username": "author"})
+        self.assertEqual(data["author"]["posts_count"], 16)
+        self.assertEqual(len(data["results"]), 10)
+        response = self.client.get(reverse("posts:api_group",
+                                           kwargs={"slug": "nope"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch(self):
+        """ Порядок id сохраняется, отсутствующие перечислены отдельно """
+        ids = list(Post.objects.values_list("pk", flat=True)[:3])
+        data = self.get("api_posts_batch",
+                        ids=",".join(map(str, ids[::-1] + [0])))
+        self.assertEqual([post["id"] for post in data["results"]],
+                         ids[::-1])
+        self.assertEqual(data["missing"], [0])
+        response = self.client.get(reverse("posts:api_posts_batch"),
+                                   {"ids": "1,x"})
+        self.assertEqual(response.status_code, 400)
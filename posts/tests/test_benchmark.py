@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+from django.db.models import Max, Min
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import FeedEntry, Post, ProfileStats
+
+
+class TestBenchmark(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def generate(self, size, **options):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "bench.sqlite3")
+        try:
+            info = benchmark.generate(size, path, log=lambda message: None,
+                                      **options)
+            self.assertEqual(benchmark.dataset_info(path), info)
+        finally:
+            os.remove(path + ".json")
+            os.rmdir(directory)
+        return info
+
+    def test_posts_spread_over_time(self):
+        """ Посты набора выходят раз в секунду, а не в момент генерации """
+        self.generate(120, batch_size=50)
+        dates = Post.objects.aggregate(first=Min("pub_date"),
+                                       last=Max("pub_date"))
+        span = (dates["last"] - dates["first"]).total_seconds()
+        self.assertAlmostEqual(span, 119, delta=1)
+        self.assertEqual(Post.objects.values("pub_date").distinct().count(),
+                         120)
+
+    def test_generate_and_measure(self):
+        """ Маленький набор проходит все сценарии без ошибок """
+        self.generate(300, batch_size=100)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertEqual(ProfileStats.objects.get(
+            user__username="author0").posts_count, 30)
+
+        results = benchmark.measure(requests=2, warmup=0)
+        self.assertEqual(set(results), set(benchmark.scenarios()[1]))
+        for name, row in results.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+                self.assertGreater(row["queries"], 0)
@@ -0,0 +1,218 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class TestComments(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.post = Post.objects.create(author=cls.author, text="Запись")
+        # у каждого комментария свой автор: автор не должен стоить запроса
+        for number in range(12):
+            Comment.objects.create(
+                post=cls.post, text=f"Комментарий {number}",
+                author=User.objects.create(username=f"reader{number}"))
+        cls.kwargs = {"username": "author", "post_id": cls.post.pk}
+
+    def setUp(self):
+        self.client = Client()
+        self.user_client = Client()
+        self.user_client.force_login(self.author)
+
+    def test_post_page_shows_first_comments(self):
+        """ На странице поста первая порция комментариев по порядку """
+        response = self.client.get(reverse("posts:post",
+                                           kwargs=self.kwargs))
+        page = response.context["comments_page"]
+        self.assertEqual([comment.text for comment in page],
+                         [f"Комментарий {number}" for number in range(5)])
+        self.assertTrue(page.has_next())
+        self.assertContains(response, reverse("posts:comments",
+                                              kwargs=self.kwargs))
+
+    def test_more_comments_cover_all(self):
+        """ "Показать ещё" отдает следующие порции без повторов """
+        response = self.client.get(reverse("posts:post",
+                                           kwargs=self.kwargs))
+        page = response.context["comments_page"]
+        texts = [comment.text for comment in page]
+        while page.has_next():
+            response = self.client.get(
+                reverse("posts:comments", kwargs=self.kwargs)
+                + f"?after={page.next_cursor}")
+            self.assertNotContains(response, "<html")
+            page = response.context["comments_page"]
+            texts += [comment.text for comment in page]
+        self.assertEqual(texts,
+                         [f"Комментарий {number}" for number in range(12)])
+
+    def test_queries_do_not_depend_on_comments(self):
+        """ Число запросов страницы не растет с числом комментариев """
+        url = reverse("posts:post", kwargs=self.kwargs)
+        with override_settings(COMMENTS_PER_PAGE=1):
+            few = self.client.get(url)["X-Query-Count"]
+        many = self.client.get(url)["X-Query-Count"]
+        self.assertEqual(few, many)
+
+    def test_more_comments_of_other_author(self):
+        """ Комментарии поста ищутся только у его автора """
+        User.objects.create(username="stranger")
+        response = self.client.get(reverse(
+            "posts:comments",
+            kwargs={"username": "stranger", "post_id": self.post.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_ajax_comment_returns_fragment(self):
+        """ Из скрипта страницы в ответе только карточка комментария """
+        response = self.user_client.post(
+            reverse("posts:add_comment", kwargs=self.kwargs),
+            {"text": "Новый комментарий"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(response.status_code, 201)
+        self.assertContains(response, "Новый комментарий", status_code=201)
+        self.assertNotContains(response, "Комментарий 0", status_code=201)
+        self.assertNotContains(response, "<html", status_code=201)
+
+    def test_json_comment(self):
+        """ С Accept: application/json комментарий приходит в JSON """
+        response = self.user_client.post(
+            reverse("posts:add_comment", kwargs=self.kwargs),
+            {"text": "Новый комментарий"}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        comment = Comment.objects.get(pk=data["id"])
+        self.assertEqual(comment.text, "Новый комментарий")
+        self.assertEqual(data["author"], "author")
+        self.assertIn(f'data-comment="{comment.pk}"', data["html"])
+
+    def test_json_comment_errors(self):
+        """ Пустой комментарий из скрипта - 400 с ошибками формы """
+        response = self.user_client.post(
+            reverse("posts:add_comment", kwargs=self.kwargs),
+            {"text": ""}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("text", response.json()["errors"])
+
+    def test_form_comment_redirects(self):
+        """ Обычная форма по-прежнему возвращает на страницу поста """
+        response = self.user_client.post(
+            reverse("posts:add_comment", kwargs=self.kwargs),
+            {"text": "Новый комментарий"})
+        self.assertRedirects(response, reverse("posts:post",
+                                               kwargs=self.kwargs))
+
+
+class TestCommentThreads(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="author")
+        cls.post = Post.objects.create(author=cls.author, text="Запись")
+        cls.first = cls.comment("первый")
+        cls.second = cls.comment("второй")
+        cls.reply = cls.comment("ответ на первый", parent=cls.first)
+        cls.nested = cls.comment("ответ на ответ", parent=cls.reply)
+        cls.kwargs = {"username": "author", "post_id": cls.post.pk}
+
+    @classmethod
+    def comment(cls, text, parent=None, post=None):
+        return Comment.objects.create(post=post or cls.post, text=text,
+                                      author=cls.author, parent=parent)
+
+    def setUp(self):
+        self.user_client = Client()
+        self.user_client.force_login(self.author)
+
+    def texts(self, response):
+        return [item.text for item in response.context["comments_page"]]
+
+    def test_replies_follow_parent(self):
+        """ Ответы показываются сразу под родителем, с отступом """
+        response = self.user_client.get(reverse("posts:post",
+                                                kwargs=self.kwargs))
+        self.assertEqual(self.texts(response),
+                         ["первый", "ответ на первый", "ответ на ответ",
+                          "второй"])
+        self.assertEqual([item.depth for item in
+                          response.context["comments_page"]], [0, 1, 2, 0])
+
+    def test_thread_is_one_range_query(self):
+        """ Ветка комментария - один запрос по диапазону путей """
+        comments = Comment.objects.filter(post=self.post)
+        with self.assertNumQueries(1):
+            page = threads.thread_page(comments, 10, root=self.first.path)
+        self.assertEqual([item.pk for item in page],
+                         [self.first.pk, self.reply.pk, self.nested.pk])
+
+    def test_thread_page(self):
+        """ ?thread= оставляет на странице одну ветку """
+        response = self.user_client.get(
+            reverse("posts:post", kwargs=self.kwargs)
+            + f"?thread={self.reply.pk}")
+        self.assertEqual(self.texts(response),
+                         ["ответ на первый", "ответ на ответ"])
+
+    @override_settings(COMMENTS_PER_PAGE=1)
+    def test_thread_pages(self):
+        """ Подгрузка порций ветки не выходит за ее пределы """
+        url = reverse("posts:comments", kwargs=self.kwargs)
+        texts, after = [], ""
+        while after is not None:
+            response = self.user_client.get(
+                url + f"?thread={self.first.pk}&after={after}")
+            texts += self.texts(response)
+            after = response.context["comments_page"].next_cursor
+        self.assertEqual(texts, ["первый", "ответ на первый",
+                                 "ответ на ответ"])
+
+    def test_unknown_thread(self):
+        other = Post.objects.create(author=self.author, text="Другая")
+        foreign = self.comment("чужой", post=other)
+        url = reverse("posts:post", kwargs=self.kwargs)
+        for thread in (foreign.pk, "abc"):
+            with self.subTest(thread=thread):
+                response = self.user_client.get(url + f"?thread={thread}")
+                self.assertEqual(response.status_code, 404)
+
+    def test_add_reply(self):
+        """ Ответ из формы получает родителя и путь под ним """
+        response = self.user_client.post(
+            reverse("posts:add_comment", kwargs=self.kwargs),
+            {"text": "ещё ответ", "parent": self.second.pk},
+            HTTP_ACCEPT="application/json")
+        data = response.json()
+        self.assertEqual(data["parent"], self.second.pk)
+        self.assertTrue(data["path"].startswith(self.second.path))
+
+    def test_reply_to_other_post(self):
+        other = Post.objects.create(author=self.author, text="Другая")
+        foreign = self.comment("чужой", post=other)
+        response = self.user_client.post(
+            reverse("posts:add_comment", kwargs=self.kwargs),
+            {"text": "ответ", "parent": foreign.pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(text="ответ").exists())
+
+    def test_deep_replies_flatten(self):
+        """ Глубже MAX_DEPTH ответ встает рядом с родителем """
+        parent = self.nested
+        for _ in range(threads.MAX_DEPTH):
+            parent = self.comment("глубже", parent=parent)
+        self.assertEqual(parent.depth, threads.MAX_DEPTH - 1)
+        self.assertEqual(parent.parent.depth, threads.MAX_DEPTH - 2)
+
+    def test_delete_removes_subtree(self):
+        """ Удаление комментария удаляет ответы и уменьшает счетчик """
+        Comment.objects.get(pk=self.first.pk).delete()
+        self.assertEqual(list(Comment.objects.values_list("text", flat=True)),
+                         ["второй"])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
@@ -0,0 +1,90 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestExport(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.writer = User.objects.create(username="writer")
+        cls.reader = User.objects.create(username="reader")
+        group = Group.objects.create(title="Выгрузка", slug="dump")
+        cls.post = Post.objects.create(author=cls.writer, group=group,
+                                       text="Пост, с запятой")
+        Post.objects.create(author=cls.writer, text="без сообщества")
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text="комментарий")
+        Follow.objects.create(user=cls.reader, author=cls.writer)
+
+    def export(self, *args):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "dump")
+        try:
+            call_command("export_posts", path, *args)
+            with open(path, "rb") as file:
+                return file.read()
+        finally:
+            os.remove(path)
+            os.rmdir(directory)
+
+    def test_jsonl_round_trip(self):
+        """ Выгрузку в JSONL без потерь читает import_posts """
+        data = gzip.decompress(self.export("--gzip", "--chunk-size", "1"))
+        records = [json.loads(line) for line in data.decode().splitlines()]
+        self.assertEqual([record["type"] for record in records],
+                         ["post", "post", "comment", "follow"])
+        self.assertEqual(records[0]["group"], "dump")
+
+        before = list(Post.objects.values_list("id", "text", "pub_date",
+                                               "group_id"))
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "dump.jsonl")
+        with open(path, "wb") as file:
+            file.write(data)
+        try:
+            call_command("import_posts", path, stdout=io.StringIO())
+        finally:
+            os.remove(path)
+            os.rmdir(directory)
+        self.assertEqual(list(Post.objects.values_list(
+            "id", "text", "pub_date", "group_id")), before)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+        self.assertTrue(Follow.objects.filter(user=self.reader).exists())
+
+    def test_csv(self):
+        """ В CSV один вид записей, пустые поля - пустые строки """
+        rows = list(csv.DictReader(io.StringIO(
+            self.export("--format", "csv", "--type", "post").decode())))
+        self.assertEqual(rows[0]["text"], "Пост, с запятой")
+        self.assertEqual(rows[1]["group"], "")
+
+    def test_admin_action(self):
+        """ Действие админки отдает файл потоком """
+        admin = User.objects.create_superuser("admin", "a@a.ru", "secret")
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse("admin:posts_post_changelist"), {
+            "action": "export_jsonl",
+            "_selected_action": [self.post.pk],
+        })
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertIn("yatube-post.jsonl", response["Content-Disposition"])
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["id"], self.post.pk)
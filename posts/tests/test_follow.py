@@ -1,8 +1,14 @@
+import io
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Post
+from posts.feed import followed_author_ids
+from posts.models import (FanOutBacklog, FeedEntry, Follow, Post,
+                          ProfileStats)
 
 
 class FollowTests(TestCase):
@@ -68,7 +74,7 @@ class FollowTests(TestCase):
         self.assertEqual(test_message, "My name is Myst! Hello!",
                          "Неверное сообщение в ленте по подписке")
         # должен появиться список с автором в контексте страницы
-        self.assertEqual(response_john.context.get("authors"), [2],
+        self.assertEqual(response_john.context.get("authors"), {2},
                          "Передался неверный список авторов")
         # отписываем john от myst
         john_unfollow_myst_url = reverse("posts:profile_unfollow",
@@ -79,7 +85,7 @@ class FollowTests(TestCase):
                          "У john без подписок не отобразилась страница")
         response_john = self.authorized_john.get(follow_index)
         # список авторов на которых подписан john должен стать пустым
-        self.assertEqual(response_john.context.get("authors"), [],
+        self.assertEqual(response_john.context.get("authors"), set(),
                          "Передался не пустой список авторов")
 
     def test_unable_follow_twice(self):
@@ -104,3 +110,116 @@ class FollowTests(TestCase):
         count_follows_second = FollowTests.johndoe.following.count()
         self.assertEqual(count_follows_first, count_follows_second,
                          "Повторная подписка невозможна")
+
+    def test_feed_filled_on_write(self):
+        """ Пост раскладывается в ленту подписчика, отписка её чистит """
+        Follow.objects.create(user=FollowTests.johndoe,
+                              author=FollowTests.myst)
+        # подписка докладывает уже опубликованный пост
+        self.assertEqual(
+            FeedEntry.objects.filter(user=FollowTests.johndoe).count(), 1)
+        post = Post.objects.create(text="Новый пост от myst",
+                                   author=FollowTests.myst)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowTests.johndoe, post=post).exists(),
+            "Новый пост не попал в ленту подписчика")
+
+        response = self.authorized_john.get(reverse("posts:follow_index"))
+        self.assertEqual(response.context.get("page")[0], post)
+
+        Follow.objects.get(user=FollowTests.johndoe,
+                           author=FollowTests.myst).delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=FollowTests.johndoe).exists(),
+            "После отписки лента не очистилась")
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_large_author_pulled_on_read(self):
+        """ Посты популярного автора не раскладываются, а читаются из Post """
+        Follow.objects.create(user=FollowTests.johndoe,
+                              author=FollowTests.myst)
+        Post.objects.create(text="Пост популярного автора",
+                            author=FollowTests.myst)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=FollowTests.johndoe).exists())
+
+        response = self.authorized_john.get(reverse("posts:follow_index"))
+        self.assertEqual(len(response.context.get("page")), 2)
+        self.assertEqual(response.context.get("page")[0].text,
+                         "Пост популярного автора")
+
+        # курсорный режим объединяет части ленты после фильтрации
+        response = self.authorized_john.get(
+            reverse("posts:follow_index") + "?after=")
+        self.assertEqual([post.text for post in response.context["page"]],
+                         ["Пост популярного автора",
+                          "My name is Myst! Hello!"])
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_author_back_under_limit(self):
+        """ Посты, вышедшие у популярного автора, не пропадают из лент """
+        reader = get_user_model().objects.create(username="reader")
+        late = get_user_model().objects.create(username="late")
+        Follow.objects.create(user=FollowTests.johndoe,
+                              author=FollowTests.myst)
+        Follow.objects.create(user=reader, author=FollowTests.myst)
+        Follow.objects.create(user=late, author=FollowTests.myst)
+        post = Post.objects.create(text="Пост популярного автора",
+                                   author=FollowTests.myst)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        # отписка ничего не раскладывает, автор читается напрямую
+        Follow.objects.get(user=reader, author=FollowTests.myst).delete()
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_john.get(reverse("posts:follow_index"))
+        self.assertEqual(response.context.get("page")[0].text,
+                         "Пост популярного автора")
+
+        out = io.StringIO()
+        call_command("fan_out_backlog", "--batch-size", "1", stdout=out)
+        # новый пост - обоим подписчикам, старый - только подписавшемуся,
+        # пока автор был популярным
+        self.assertIn("Разложено записей: 3", out.getvalue())
+        self.assertEqual(
+            set(FeedEntry.objects.values_list("user__username", "post_id")),
+            {("johndoe", post.pk), ("late", post.pk),
+             ("johndoe", post.pk - 1), ("late", post.pk - 1)})
+        self.assertFalse(FanOutBacklog.objects.exists())
+        response = self.authorized_john.get(reverse("posts:follow_index"))
+        self.assertEqual(response.context.get("page")[0].text,
+                         "Пост популярного автора")
+
+    def test_profile_stats_counters(self):
+        """ Счетчики профиля меняются вместе с подписками и постами """
+        self.authorized_john.get(reverse("posts:profile_follow",
+                                         kwargs={"username": "myst"}))
+        Post.objects.create(text="Ещё один пост", author=FollowTests.myst)
+
+        john = ProfileStats.objects.get(user=FollowTests.johndoe)
+        myst = ProfileStats.objects.get(user=FollowTests.myst)
+        self.assertEqual((john.posts_count, john.following_count,
+                          john.followers_count), (1, 1, 0))
+        self.assertEqual((myst.posts_count, myst.following_count,
+                          myst.followers_count), (2, 0, 1))
+
+        response = self.authorized_myst.get(
+            reverse("posts:profile", kwargs={"username": "myst"}))
+        self.assertEqual(response.context["followers"], 1)
+        self.assertEqual(response.context["posts_count"], 2)
+
+        self.authorized_john.get(reverse("posts:profile_unfollow",
+                                         kwargs={"username": "myst"}))
+        myst.refresh_from_db()
+        self.assertEqual(myst.followers_count, 0)
+
+    def test_follow_set_cached(self):
+        """ Множество подписок читается из кэша и сбрасывается подпиской """
+        cache.clear()
+        self.assertEqual(followed_author_ids(FollowTests.johndoe), set())
+        with self.assertNumQueries(0):
+            followed_author_ids(FollowTests.johndoe)
+
+        Follow.objects.create(user=FollowTests.johndoe,
+                              author=FollowTests.myst)
+        self.assertEqual(followed_author_ids(FollowTests.johndoe),
+                         {FollowTests.myst.id})
@@ -1,8 +1,16 @@
+import shutil
+import tempfile
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F
+from django.db.models.signals import pre_save
 from django.shortcuts import get_object_or_404
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from posts import thumbnails
 from posts.models import Post
 
 
@@ -74,3 +82,74 @@ class TestForms(TestCase):
         edited_post = get_object_or_404(Post, id=1)
         self.assertEqual(edited_post.text, "Измененный текст",
                          "Текст в базе не имезменился после редактирования")
+
+    def test_edit_keeps_counters(self):
+        """ Правка не затирает счетчик комментариев и рейтинг """
+        def comment_meanwhile(sender, instance, **kwargs):
+            # комментарий и пересчет рейтинга между чтением поста и записью
+            Post.objects.filter(pk=instance.pk).update(
+                comments_count=F("comments_count") + 1, trending_score=5.0)
+
+        pre_save.connect(comment_meanwhile, sender=Post)
+        self.addCleanup(pre_save.disconnect, comment_meanwhile, sender=Post)
+        self.authorized_client.post(
+            reverse("posts:edit_post",
+                    kwargs={"username": self.user.username, "post_id": 1}),
+            data={"text": "Измененный текст", "group": ""})
+        post = Post.objects.get(id=1)
+        self.assertEqual((post.text, post.comments_count, post.trending_score),
+                         ("Измененный текст", 1, 5.0))
+
+    def test_image_dimensions_stored(self):
+        """ Размеры картинки сохраняются при загрузке """
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            self.authorized_client.post(
+                reverse("posts:new_post"),
+                data={"text": "С картинкой", "group": "",
+                      "image": SimpleUploadedFile("dims.gif", small_gif,
+                                                  content_type="image/gif")},
+                follow=True
+            )
+        post = Post.objects.get(text="С картинкой")
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+
+    def test_new_image_gets_new_variants(self):
+        """ Замена картинки сбрасывает сохраненный набор вариантов """
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        edit_url = reverse("posts:edit_post",
+                           kwargs={"username": self.user.username,
+                                   "post_id": 1})
+        sets = []
+        with override_settings(MEDIA_ROOT=media_root):
+            for name in ("first.gif", "second.gif"):
+                self.authorized_client.post(edit_url, data={
+                    "text": "С картинкой", "group": "",
+                    "image": SimpleUploadedFile(name, small_gif,
+                                                content_type="image/gif")})
+                self.assertIsNone(thumbnails.ready_card_images(
+                    Post.objects.get(id=1)))
+                # то же, что делает очередь после фиксации транзакции
+                thumbnails._generate(1)
+                sets.append(thumbnails.ready_card_images(
+                    Post.objects.get(id=1)))
+        self.assertTrue(all(images["webp_srcset"] for images in sets))
+        self.assertNotEqual(sets[0]["src"], sets[1]["src"])
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import (Comment, FeedEntry, Follow, Group, Post,
+                          ProfileStats)
+from posts.search import search_posts
+
+User = get_user_model()
+
+
+class TestImportPosts(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.writer = User.objects.create(username="writer")
+        cls.reader = User.objects.create(username="reader")
+        cls.group = Group.objects.create(title="Архив", slug="archive")
+
+    def run_import(self, name, content, *args):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        out = StringIO()
+        try:
+            call_command("import_posts", path, *args, stdout=out)
+        finally:
+            os.remove(path)
+            os.rmdir(directory)
+        return out.getvalue()
+
+    def test_jsonl_import(self):
+        """ Посты, подписки и комментарии с сохранением id и дат """
+        records = [
+            {"type": "follow", "user": "reader", "author": "writer"},
+            {"id": 500, "author": "writer", "group": "archive",
+             "text": "архивная заметка", "pub_date": "2015-03-01T10:00:00"},
+            {"id": 501, "author": "writer", "text": "вторая заметка",
+             "pub_date": "2015-03-02T10:00:00+00:00"},
+            {"type": "comment", "post": 500, "author": "reader",
+             "text": "старый комментарий", "created": "2015-03-03T10:00:00"},
+            {"type": "comment", "post": 999, "author": "reader",
+             "text": "к несуществующему посту"},
+            {"author": "nobody", "text": "неизвестный автор"},
+            {"type": "follow", "user": "reader", "author": "writer"},
+        ]
+        # пачки по две записи: порядок сохранения внутри пачки важен
+        with self.assertLogs("posts.importer", "WARNING"):
+            self.run_import(
+                "archive.jsonl",
+                "\n".join(json.dumps(record) for record in records),
+                "--batch-size", "2", "--batches-per-transaction", "1")
+
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 3)
+        self.assertEqual(Follow.objects.count(), 1)
+
+        stats = ProfileStats.objects.get(user=self.writer)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.reader).following_count, 1)
+        self.assertEqual(set(FeedEntry.objects.filter(
+            user=self.reader).values_list("post_id", flat=True)), {500, 501})
+        self.assertEqual([result.post for result in search_posts("архивная")],
+                         [post])
+
+        # новые посты после импорта получают следующие id
+        self.assertGreater(
+            Post.objects.create(author=self.writer, text="новый").pk, 501)
+
+    def test_comment_replies_import(self):
+        """ Ответы из архива встают в ветку своего родителя """
+        post = Post.objects.create(author=self.writer, text="пост")
+        records = [
+            {"type": "comment", "id": 700, "post": post.pk,
+             "author": "reader", "text": "вопрос"},
+            {"type": "comment", "id": 701, "post": post.pk, "parent": 700,
+             "author": "writer", "text": "ответ"},
+            {"type": "comment", "post": post.pk, "parent": 404,
+             "author": "writer", "text": "ответ в пустоту"},
+        ]
+        self.run_import("archive.jsonl",
+                        "\n".join(json.dumps(record) for record in records),
+                        "--batch-size", "2")
+
+        question, answer = Comment.objects.order_by("path")
+        self.assertEqual(answer.parent, question)
+        self.assertTrue(answer.path.startswith(question.path))
+        self.assertEqual(answer.depth, 1)
+
+    def test_bad_lines_and_taken_ids_skipped(self):
+        """ Испорченная строка и занятый id не прерывают импорт """
+        taken = Post.objects.create(author=self.writer, text="уже есть")
+        comment = Comment.objects.create(post=taken, author=self.reader,
+                                         text="уже есть")
+        lines = [
+            json.dumps({"id": taken.pk, "author": "writer",
+                        "text": "тот же id"}),
+            '{"author": "writer", "text": ',
+            "[1, 2]",
+            json.dumps({"id": 900, "author": "writer", "text": "новый"}),
+            json.dumps({"id": 900, "author": "writer", "text": "повтор"}),
+            json.dumps({"type": "comment", "id": comment.pk,
+                        "post": taken.pk, "author": "reader",
+                        "text": "тот же id"}),
+            json.dumps({"type": "comment", "post": 900, "author": "reader",
+                        "text": "к новому"}),
+        ]
+        with self.assertLogs("posts.importer", "WARNING") as logs:
+            out = self.run_import("broken.jsonl", "\n".join(lines))
+        self.assertIn("постов 1, комментариев 1, подписок 0, пропущено 5",
+                      out)
+        self.assertEqual(len(logs.output), 5)
+        self.assertIn("строка 2", logs.output[0])
+        self.assertEqual(Post.objects.get(pk=900).text, "новый")
+        self.assertEqual(Post.objects.get(pk=taken.pk).text, "уже есть")
+        self.assertEqual(Comment.objects.get(pk=comment.pk).text, "уже есть")
+
+    def test_csv_import(self):
+        """ CSV без id, неизвестные авторы создаются по флагу """
+        self.run_import(
+            "posts.csv",
+            "author,text,group,pub_date\n"
+            "writer,первый,archive,2016-01-01T00:00:00\n"
+            "newcomer,второй,,\n",
+            "--create-missing")
+        self.assertEqual(Post.objects.count(), 2)
+        newcomer = User.objects.get(username="newcomer")
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertEqual(ProfileStats.for_user(newcomer).posts_count, 1)
+        self.assertEqual(len(search_posts("первый")), 1)
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post
+from posts.models import Comment, Group, Post
 
 
 class TestPostModels(TestCase):
@@ -91,3 +94,41 @@ class TestGroupModels(TestCase):
     def test_group_str_correct(self):
         self.assertEqual(TestGroupModels.group.__str__(),
                          "Авиа")
+
+
+class TestCommentsCount(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create_user(username="Myst")
+        cls.post = Post.objects.create(author=cls.user, text="Пост")
+
+    def test_counter_follows_comments(self):
+        """ Счетчик растет при добавлении и падает при удалении """
+        comment = Comment.objects.create(post=self.post, author=self.user,
+                                         text="Первый")
+        Comment.objects.create(post=self.post, author=self.user,
+                               text="Второй")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+        # каскад от автора комментария тоже уменьшает счетчик
+        commentator = get_user_model().objects.create_user(username="Guest")
+        Comment.objects.create(post=self.post, author=commentator,
+                               text="Гостевой")
+        commentator.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        """ Команда reconcile_comments исправляет расхождения """
+        Comment.objects.create(post=self.post, author=self.user,
+                               text="Комментарий")
+        Post.objects.filter(pk=self.post.pk).update(comments_count=10)
+        call_command("reconcile_comments", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
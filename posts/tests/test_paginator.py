@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Post
@@ -28,3 +28,48 @@ class TestPaginator(TestCase):
         response = self.client.get(reverse("posts:index") + "/?page=2")
 
         self.assertEqual(len(response.context.get("page").object_list), 3)
+
+    def test_cursor_pages_cover_all_records(self):
+        """ Курсорный режим: ?after= ведет дальше, ?before= возвращает """
+        response = self.client.get(reverse("posts:index") + "?after=")
+        first_page = response.context.get("page")
+        self.assertEqual(len(first_page), 10)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        response = self.client.get(
+            reverse("posts:index") + f"?after={first_page.next_cursor}")
+        second_page = response.context.get("page")
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(set(first_page) & set(second_page),
+                         "Записи на страницах повторяются")
+
+        response = self.client.get(
+            reverse("posts:index")
+            + f"?before={second_page.previous_cursor}")
+        back_page = response.context.get("page")
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertTrue(back_page.has_next())
+
+        # старые записи удалили - со страницы ?before= дальше идти некуда
+        Post.objects.filter(pk__in=[post.pk for post in second_page]).delete()
+        response = self.client.get(
+            reverse("posts:index")
+            + f"?before={second_page.previous_cursor}")
+        self.assertFalse(response.context.get("page").has_next())
+
+    @override_settings(POSTS_PAGINATION="cursor")
+    def test_cursor_mode_from_settings(self):
+        """ Курсорный режим включается настройкой для всех лент """
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:profile", kwargs={"username": "johndoe"}),
+        ]
+        for url in urls:
+            with self.subTest(value=url):
+                response = self.client.get(url)
+                page = response.context.get("page")
+                self.assertTrue(page.cursor_mode)
+                self.assertEqual(len(page), 10)
+                self.assertContains(response, f"?after={page.next_cursor}")
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import feed
+from posts.models import Comment, Follow, Group, Post
+from yatube.testing import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class TestQueryBudgets(QueryBudgetMixin, TestCase):
+    """ Число запросов страниц не растет с числом постов на странице """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        authors = [User.objects.create(username=f"author{number}")
+                   for number in range(3)]
+        groups = [Group.objects.create(title=f"Группа {number}",
+                                       slug=f"group-{number}")
+                  for number in range(2)]
+        cls.reader = User.objects.create(username="reader")
+        for author in authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+            Follow.objects.create(user=author, author=authors[2])
+        for number in range(12):
+            post = Post.objects.create(author=authors[number % 3],
+                                       group=groups[number % 2],
+                                       text=f"Запись {number}")
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text=f"Комментарий {number}")
+        cls.post = post
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_pages_within_budget(self):
+        author = self.post.author.username
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_slug", kwargs={"slug": "group-0"}),
+            reverse("posts:profile", kwargs={"username": author}),
+            reverse("posts:post", kwargs={"username": author,
+                                          "post_id": self.post.pk}),
+            reverse("posts:comments", kwargs={"username": author,
+                                              "post_id": self.post.pk}),
+            reverse("posts:show_groups"),
+            reverse("posts:search") + "?q=Запись",
+            reverse("posts:trending"),
+        ]
+        for url in urls:
+            for client in (self.guest_client, self.reader_client):
+                with self.subTest(url=url, client=client):
+                    self.assertWithinQueryBudget(client, url)
+        with self.subTest(url="follow"):
+            self.assertWithinQueryBudget(self.reader_client,
+                                         reverse("posts:follow_index"))
+
+    def test_post_cards_single_query(self):
+        """ Карточки лент: автор и сообщество без запросов на пост """
+        with self.assertNumQueries(1):
+            cards = [(post.author.username, post.group.title,
+                      post.comments_count)
+                     for post in feed.post_cards()]
+        self.assertEqual(len(cards), 12)
+        sql = str(feed.post_cards().query)
+        self.assertNotIn("trending_score", sql)
+        self.assertNotIn("password", sql)
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def query_plan(sql):
+    """ Строки EXPLAIN QUERY PLAN для уже выполненного запроса """
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """ Полный просмотр таблицы и сортировка во временном B-дереве
+
+    Просмотр подзапроса (например, union частей ленты под COUNT) не
+    считается: его части сами проверяются по своим шагам плана.
+    """
+    tables = set(connection.introspection.table_names())
+    # SQLite до 3.36 пишет "SCAN TABLE name"
+    plan = [step.replace("SCAN TABLE ", "SCAN ") for step in plan]
+    return [step for step in plan
+            if "USE TEMP B-TREE" in step
+            or (step.startswith("SCAN ") and " USING " not in step
+                and step.split()[1] in tables)]
+
+
+@override_settings(FEED_FANOUT_LIMIT=1)
+class TestFeedQueryPlans(TestCase):
+    """ Каждый запрос лент читает строки по индексу и в нужном порядке """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username="reader")
+        cls.author = User.objects.create(username="author")
+        cls.star = User.objects.create(username="star")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        # у star больше подписчиков, чем FEED_FANOUT_LIMIT
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=cls.author, author=cls.star)
+        for number in range(12):
+            post = Post.objects.create(
+                author=cls.author if number % 2 else cls.star,
+                group=cls.group, text=f"Запись {number}")
+        cls.post = post
+        Comment.objects.create(post=post, author=cls.reader, text="Ответ")
+        trending.update()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_urls(self):
+        feeds = [
+            reverse("posts:index"),
+            reverse("posts:follow_index"),
+            reverse("posts:group_slug", kwargs={"slug": "group"}),
+            reverse("posts:profile", kwargs={"username": "star"}),
+        ]
+        post_kwargs = {"username": self.post.author.username,
+                       "post_id": self.post.pk}
+        comment = self.post.comments.get()
+        urls = [reverse("posts:post", kwargs=post_kwargs),
+                reverse("posts:comments", kwargs=post_kwargs)
+                + f"?after={comment.path}",
+                reverse("posts:comments", kwargs=post_kwargs)
+                + f"?thread={comment.pk}",
+                reverse("posts:api_index"),
+                reverse("posts:trending")]
+        for url in feeds:
+            # номера страниц, первая страница и переход по курсорам
+            page = self.client.get(url + "?after=").context["page"]
+            urls += [url, url + "?page=2",
+                     url + f"?after={page.next_cursor}",
+                     url + f"?before={page.next_cursor}"]
+        return urls
+
+    def test_feed_queries_use_indexes(self):
+        for url in self.feed_urls():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT"):
+                    continue
+                with self.subTest(url=url, sql=sql):
+                    self.assertEqual(plan_problems(query_plan(sql)), [])
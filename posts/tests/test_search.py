@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import search_posts
+
+
+class TestSearch(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username="searcher")
+        cls.rich = Post.objects.create(
+            author=cls.user,
+            text="Самолёт, самолёт и ещё раз самолёт над аэродромом")
+        cls.poor = Post.objects.create(
+            author=cls.user,
+            text="Длинный рассказ о поездке на море, где однажды "
+                 "пролетел самолёт, а потом мы долго купались")
+        Post.objects.create(author=cls.user, text="Про кошек и собак")
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_ranking_and_snippet(self):
+        """ Лучшее совпадение первым, совпадения выделены <mark> """
+        results = search_posts("самолёт")
+        self.assertEqual([result.post for result in results],
+                         [self.rich, self.poor])
+        self.assertIn("<mark>", results[0].snippet)
+
+    def test_prefix_and_escape(self):
+        """ Последнее слово ищется по префиксу, html в тексте экранируется """
+        post = Post.objects.create(author=self.user,
+                                   text="<b>аэродромный</b> сбор")
+        results = search_posts("аэродромн")
+        self.assertIn(post, [result.post for result in results])
+        snippet = [result.snippet for result in results
+                   if result.post == post][0]
+        self.assertNotIn("<b>", snippet)
+        self.assertEqual(search_posts("  ;; "), [])
+
+    def test_index_follows_save_and_delete(self):
+        """ Индекс обновляется при правке и удалении поста """
+        post = Post.objects.create(author=self.user, text="вертолёт")
+        self.assertEqual(len(search_posts("вертолёт")), 1)
+        post.text = "дирижабль"
+        post.save()
+        self.assertEqual(search_posts("вертолёт"), [])
+        self.assertEqual(len(search_posts("дирижабль")), 1)
+        post.delete()
+        self.assertEqual(search_posts("дирижабль"), [])
+
+    def test_reindex_command(self):
+        """ reindex_posts восстанавливает индекс с нуля """
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM posts_post_fts")
+        self.assertEqual(search_posts("самолёт"), [])
+        call_command("reindex_posts", stdout=StringIO())
+        self.assertEqual(len(search_posts("самолёт")), 2)
+
+    def test_search_pages(self):
+        """ Страница поиска и JSON-ответ """
+        response = self.client.get(reverse("posts:search"),
+                                   {"q": "самолёт"})
+        self.assertEqual(len(response.context["results"]), 2)
+        self.assertIsNone(response.context["next_offset"])
+        with self.settings(SEARCH_RESULTS_PER_PAGE=1):
+            data = self.client.get(reverse("posts:search_api"),
+                                   {"q": "самолёт"}).json()
+        self.assertEqual(data["next_offset"], 1)
+        self.assertEqual(data["results"][0]["id"], self.rich.pk)
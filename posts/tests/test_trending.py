@@ -0,0 +1,124 @@
+import datetime as dt
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=12, TRENDING_COMMENT_WEIGHT=1.0,
+                   TRENDING_FOLLOW_WEIGHT=2.0, TRENDING_FOLLOW_WINDOW_DAYS=3)
+class TestTrending(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.reader = User.objects.create(username="reader")
+        self.client = Client()
+        self.now = timezone.now()
+
+    def post(self, text, hours_ago=0):
+        post = Post.objects.create(author=self.author, text=text)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=self.now - dt.timedelta(hours=hours_ago))
+        return post
+
+    def comment(self, post, hours_ago=0):
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text="Комментарий")
+        Comment.objects.filter(pk=comment.pk).update(
+            created=self.now - dt.timedelta(hours=hours_ago))
+
+    def ranking(self):
+        return [post.text for post in trending.top_posts(Post.objects.all())]
+
+    def scores(self):
+        return dict(Post.objects.values_list("pk", "trending_score"))
+
+    def test_comments_outweigh_recency(self):
+        """ Обсуждаемый вчерашний пост выше свежего без комментариев """
+        old = self.post("вчерашний", hours_ago=24)
+        self.post("свежий")
+        for _ in range(3):
+            self.comment(old)
+        trending.update()
+        self.assertEqual(self.ranking(), ["вчерашний", "свежий"])
+
+    def test_old_activity_decays(self):
+        """ Комментарии трехдневной давности почти ничего не весят """
+        old = self.post("старый", hours_ago=96)
+        self.post("свежий")
+        for _ in range(5):
+            self.comment(old, hours_ago=72)
+        trending.update()
+        self.assertEqual(self.ranking(), ["свежий", "старый"])
+
+    def test_follow_lifts_recent_posts(self):
+        """ Новый подписчик поднимает недавние посты автора """
+        recent = self.post("недавний", hours_ago=6)
+        stale = self.post("давний", hours_ago=24 * 5)
+        other = User.objects.create(username="other")
+        Post.objects.create(author=other, text="чужой")
+        trending.update()
+        before = self.scores()
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(trending.update()["changed"], 1)
+        after = self.scores()
+        self.assertGreater(after[recent.pk], before[recent.pk])
+        self.assertEqual(after[stale.pk], before[stale.pk])
+
+    def test_incremental_matches_full(self):
+        """ Дописанные по частям рейтинги равны полному пересчету """
+        first = self.post("первый", hours_ago=30)
+        trending.update()
+        self.comment(first, hours_ago=20)
+        second = self.post("второй", hours_ago=10)
+        trending.update()
+        self.comment(second, hours_ago=2)
+        Follow.objects.create(user=self.reader, author=self.author)
+        trending.update()
+        incremental = self.scores()
+        trending.update(full=True)
+        for pk, score in self.scores().items():
+            self.assertAlmostEqual(incremental[pk], score)
+
+    def test_update_reads_only_new_events(self):
+        post = self.post("пост")
+        self.assertEqual(trending.update(), {"post": 1, "changed": 0})
+        self.assertEqual(trending.update(), {"post": 0, "changed": 0})
+        self.comment(post)
+        # точка сохранения, курсоры, три MAX(id), новые комментарии,
+        # рейтинги их постов, запись рейтингов и курсора, выход из точки
+        with self.assertNumQueries(10):
+            self.assertEqual(trending.update(), {"post": 0, "changed": 1})
+
+    def test_page_shows_ranking(self):
+        """ Страница показывает посты с рейтингом в его порядке """
+        old = self.post("вчерашний", hours_ago=24)
+        self.post("свежий")
+        self.comment(old)
+        self.comment(old)
+        trending.update()
+        self.post("без рейтинга")
+        url = reverse("posts:trending")
+        response = self.client.get(url)
+        self.assertEqual([post.text for post in response.context["posts"]],
+                         ["вчерашний", "свежий"])
+        self.assertNotContains(response, "без рейтинга")
+        # после пересчета старый ETag и фрагмент кэша не отдаются
+        etag = response["ETag"]
+        trending.update()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "без рейтинга")
+
+    def test_command(self):
+        self.post("пост")
+        out = io.StringIO()
+        call_command("update_trending", "--full", stdout=out)
+        self.assertIn("Новых постов: 1", out.getvalue())
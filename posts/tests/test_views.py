@@ -1,3 +1,4 @@
+import io
 import shutil
 import tempfile
 from time import sleep
@@ -7,11 +8,13 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.core.paginator import Page
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Comment, Group, Post
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post
 
 
 class StaticURLTests(TestCase):
@@ -253,20 +256,171 @@ class StaticURLTests(TestCase):
                 self.assertEqual(test_comment.text, comments[i])
 
     def test_index_cached(self):
-        """ Стартовая страница не изменяется в течении 20 с """
+        """ Стартовая страница берется из кэша, пока нет новых записей """
+        cache.clear()
         response_one = self.guest_client.get(reverse("posts:index"))
+        # изменение в обход сигналов поколение не меняет - видим кэш
+        Post.objects.filter(text="12 запись").update(text="Не попал в кэш")
+        response_two = self.guest_client.get(reverse("posts:index"))
 
         Post.objects.create(
             author=StaticURLTests.user_one,
-            text="Текст не попал в кэш",
+            text="Новая запись сразу на главной",
             group=None
         )
-
-        response_two = self.guest_client.get(reverse("posts:index"))
-        cache.clear()
         response_three = self.guest_client.get(reverse("posts:index"))
 
         self.assertEqual(response_one.content, response_two.content,
                          "Контексты отличаются - не работает кэш")
         self.assertNotEqual(response_one.content, response_three.content,
-                            "после сброса контексты одинаковые")
+                            "Новая запись не сбросила кэш")
+        self.assertContains(response_three, "Новая запись сразу на главной")
+
+    def test_feed_cache_varies_on_viewer(self):
+        """ Кнопки подписки из кэша не достаются другому пользователю """
+        cache.clear()
+        index = reverse("posts:index")
+        self.authorized_client.get(index)
+        response = self.authorized_client_john.get(index)
+        # johndoe - автор всех записей, ему кнопки подписки не показываются
+        self.assertNotContains(response, "[подписаться]")
+        self.assertContains(response, "Редактировать")
+
+    def test_feed_cache_key_ignores_other_params(self):
+        """ В ключ фрагмента входят только параметры страницы """
+        index = reverse("posts:index")
+
+        def key(query):
+            response = self.guest_client.get(index + query)
+            return response.context["feed_cache_key"]
+
+        self.assertEqual(key("?utm=1"), key(""))
+        self.assertEqual(key("?page=2&utm=1"), key("?page=2"))
+        self.assertEqual(len({key(""), key("?page=2"), key("?after="),
+                              key("?before=x")}), 4)
+
+    def test_placeholder_until_ready(self):
+        """ Пока миниатюры нет, лента показывает заглушку """
+        cache.clear()
+        group_url = reverse("posts:group_slug", kwargs={"slug": "aviators"})
+        response = self.guest_client.get(group_url)
+        self.assertContains(response, "Изображение обрабатывается")
+        self.assertNotContains(response, '<img class="card-img"')
+        # рендер ленты миниатюры не готовит и в очередь их не ставит
+        post = Post.objects.get(image="posts/small.gif")
+        self.assertIsNone(thumbnails.ready_card_images(post))
+
+        out = io.StringIO()
+        call_command("prepare_thumbnails", stdout=out)
+        self.assertIn("Подготовлено картинок: 1", out.getvalue())
+        response = self.guest_client.get(group_url)
+        self.assertContains(response, '<img class="card-img"')
+        self.assertContains(response, 'type="image/webp"')
+        # исходная картинка 2x1 не увеличивается до ширины варианта
+        self.assertContains(response, 'width="2" height="1"')
+        self.assertNotContains(response, "480w")
+        # набор хранится в посте, а не в кэше
+        cache.clear()
+        response = self.guest_client.get(group_url)
+        self.assertContains(response, 'type="image/webp"')
+        out = io.StringIO()
+        call_command("prepare_thumbnails", stdout=out)
+        self.assertIn("Подготовлено картинок: 0", out.getvalue())
+        cache.clear()
+
+    @override_settings(POST_IMAGE_WIDTHS=(480, 960))
+    def test_variant_widths(self):
+        """ Варианты не шире исходной картинки """
+        self.assertEqual(thumbnails.variant_widths(1200), [480, 960])
+        self.assertEqual(thumbnails.variant_widths(700), [480])
+        self.assertEqual(thumbnails.variant_widths(300), [300])
+        self.assertEqual(thumbnails.variant_widths(None), [480, 960])
+
+
+class TestConditionalGet(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text="Первая запись")
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = [
+            reverse("posts:index"),
+            reverse("posts:group_slug", kwargs={"slug": "group"}),
+            reverse("posts:profile", kwargs={"username": "author"}),
+            reverse("posts:post", kwargs={"username": "author",
+                                          "post_id": self.post.pk}),
+        ]
+
+    def revalidate(self, client, url):
+        """ Повторный запрос с ETag первого ответа """
+        etag = client.get(url)["ETag"]
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified_without_changes(self):
+        """ Без изменений страницы отвечают 304 """
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.guest_client, url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    def test_modified_after_comment(self):
+        """ Комментарий меняет ETag всех страниц с этим постом """
+        etags = [self.guest_client.get(url)["ETag"] for url in self.urls]
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text="Новый комментарий")
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_group_rename(self):
+        """ Новое название сообщества видно в карточках всех лент """
+        etags = [self.guest_client.get(url)["ETag"] for url in self.urls]
+        self.group.title = "Переименованная"
+        self.group.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, "Переименованная")
+
+    def test_post_page_follows_csrf_token(self):
+        """ После нового входа форма комментария не берется из кэша """
+        url = self.urls[3]
+        # без куки CSRF ETag нет: страница выдаст новый токен
+        response = self.reader_client.get(url)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(self.revalidate(self.reader_client, url).status_code,
+                         304)
+        etag = self.reader_client.get(url)["ETag"]
+        self.reader_client.logout()
+        self.reader_client.force_login(self.reader)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertEqual(self.revalidate(self.reader_client, url).status_code,
+                         304)
+
+    def test_etag_depends_on_viewer(self):
+        """ У гостя и читателя разные ETag; подписка меняет страницу """
+        url = self.urls[2]
+        guest_etag = self.guest_client.get(url)["ETag"]
+        reader_etag = self.reader_client.get(url)["ETag"]
+        self.assertNotEqual(guest_etag, reader_etag)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=reader_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=guest_etag)
+        self.assertEqual(response.status_code, 200,
+                         "Число подписчиков в профиле устарело")
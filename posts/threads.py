@@ -0,0 +1,95 @@
+""" Ветки комментариев с материализованным путем
+
+Путь комментария - id всех его предков и его собственный id, каждый
+записан в base36 фиксированной ширины SEGMENT. Поэтому сортировка по
+пути дает порядок показа (ветка сразу под своим корнем, ответы по
+времени), а ветка любого комментария - это диапазон путей
+[path, path + "~"), который читается одним запросом по индексу
+(post, path) без рекурсии и без запросов на каждый уровень.
+"""
+import re
+
+from .paginator import CursorPage
+
+SEGMENT = 8
+# глубже ответы встают рядом с родителем, а не под ним
+MAX_DEPTH = 16
+# больше любой цифры base36: верхняя граница диапазона ветки
+UPPER = "~"
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+PATH_RE = re.compile(rf"^(?:[0-9a-z]{{{SEGMENT}}})+$")
+
+
+def segment(pk):
+    """ id в base36, дополненный нулями слева до SEGMENT знаков """
+    digits = ""
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = DIGITS[digit] + digits
+    return digits.rjust(SEGMENT, "0")
+
+
+def child_path(parent_path, pk):
+    return (parent_path or "") + segment(pk)
+
+
+def ids(path):
+    """ id предков и самого комментария из пути """
+    return [int(path[start:start + SEGMENT], 36)
+            for start in range(0, len(path), SEGMENT)]
+
+
+def depth(path):
+    """ 0 - комментарий к посту, 1 - ответ на него и так далее """
+    return max(len(path) // SEGMENT - 1, 0)
+
+
+def subtree(comments, path):
+    """ Комментарий с путем path и все ответы под ним """
+    return comments.filter(path__gte=path, path__lt=path + UPPER)
+
+
+def valid_cursor(cursor):
+    return bool(cursor) and bool(PATH_RE.match(cursor))
+
+
+def thread_page(comments, per_page, after=None, root=None):
+    """ Порция комментариев в порядке показа после пути after
+
+    comments - комментарии одного поста, root - путь комментария, если
+    нужна только его ветка. Одна порция - один запрос по диапазону путей.
+    """
+    if root is not None:
+        comments = subtree(comments, root)
+    if valid_cursor(after):
+        comments = comments.filter(path__gt=after)
+    rows = list(comments.order_by("path")[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return CursorPage(rows, None,
+                      next_cursor=rows[-1].path if has_next else None)
+
+
+def fill_paths(comments, batch_size=1000):
+    """ Пути комментариев, сохраненных без них (bulk_create)
+
+    Родитель получает путь раньше ответа, потому что его id меньше.
+    Ответ глубже MAX_DEPTH переносится к родителю своего родителя.
+    """
+    model = comments.model
+    pending = list(comments.filter(path="").order_by("id").values_list(
+        "id", "parent_id"))
+    parent_ids = {parent_id for _, parent_id in pending if parent_id}
+    known = dict(model.objects.filter(pk__in=parent_ids).exclude(
+        path="").values_list("id", "path"))
+    updates = []
+    for pk, parent_id in pending:
+        parent_path = known.get(parent_id, "")
+        if depth(parent_path) + 1 >= MAX_DEPTH:
+            parent_path = parent_path[:-SEGMENT]
+            parent_id = ids(parent_path)[-1]
+        known[pk] = child_path(parent_path, pk)
+        updates.append(model(pk=pk, path=known[pk], parent_id=parent_id))
+    model.objects.bulk_update(updates, ["path", "parent"],
+                              batch_size=batch_size)
+    return len(updates)
@@ -0,0 +1,160 @@
+""" Фоновая подготовка картинок постов для карточек ленты
+
+После сохранения поста или импорта в пуле потоков нарезаются варианты
+картинки нескольких ширин в WebP и в исходном формате. Готовый набор
+(srcset, размеры) сохраняется в Post.card_images, и лента читает его
+вместе с постом. Пока набора нет, в карточке показывается легкая
+заглушка: рендер ленты никогда не декодирует и не масштабирует картинки
+и не ставит их в очередь. Посты без набора (например, после сбоя
+нарезки) готовит prepare_thumbnails.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from sorl.thumbnail import default
+
+from .generations import bump, post_scopes
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# пропорции карточки в ленте
+CARD_WIDTH = 960
+CARD_HEIGHT = 339
+# картинки не увеличиваются: вариант не шире исходной
+CARD_OPTIONS = {"crop": "center", "upscale": False}
+
+FORMATS = {
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".png": "PNG",
+    ".gif": "GIF",
+    ".webp": "WEBP",
+}
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def variant_widths(original_width):
+    """ Ширины вариантов не больше исходной ширины картинки
+
+    Если все варианты шире, остается один - в исходную ширину.
+    """
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    if not original_width:
+        return widths
+    fitting = [width for width in widths if width <= original_width]
+    return fitting or [original_width]
+
+
+def source_format(name):
+    return FORMATS.get(os.path.splitext(name)[1].lower(), "JPEG")
+
+
+def _srcset(variants):
+    return ", ".join(f"{variant.url} {variant.width}w" for variant in variants)
+
+
+def build_card_images(name, original_width=None):
+    """ Нарезает варианты картинки и описывает их для шаблона """
+    original, webp = [], []
+    for width in variant_widths(original_width):
+        geometry = f"{width}x{round(width * CARD_HEIGHT / CARD_WIDTH)}"
+        original.append(default.backend.get_thumbnail(
+            name, geometry, format=source_format(name), **CARD_OPTIONS))
+        webp.append(default.backend.get_thumbnail(
+            name, geometry, format="WEBP", **CARD_OPTIONS))
+    largest = original[-1]
+    return {
+        "src": largest.url,
+        "srcset": _srcset(original),
+        "webp_srcset": _srcset(webp),
+        "sizes": f"(max-width: {largest.width}px) 100vw, {largest.width}px",
+        "width": largest.width,
+        "height": largest.height,
+    }
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails")
+        return _executor
+
+
+def _generate(post_id):
+    try:
+        post = Post.objects.filter(pk=post_id).values_list(
+            "image", "image_width", "author_id", "group_id").first()
+        if not post or not post[0]:
+            return
+        name, original_width, author_id, group_id = post
+        images = json.dumps(build_card_images(name, original_width))
+        # картинку могли заменить, пока шла нарезка, - её набор не пишем
+        if Post.objects.filter(pk=post_id, image=name).update(
+                card_images=images):
+            # закэшированные фрагменты лент показывают заглушку
+            bump(*post_scopes(author_id, group_id))
+    except Exception:
+        logger.exception("Не удалось подготовить картинку поста %s",
+                         post_id)
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+        if threading.current_thread().name.startswith("thumbnails"):
+            # у потока пула свои соединения с базой - не оставляем открытыми
+            connections.close_all()
+
+
+def _run_inline():
+    """ Считать варианты в текущем потоке, а не в пуле
+
+    THUMBNAIL_WORKERS = 0 отключает пул. База SQLite в памяти (тесты)
+    блокирует таблицы целиком без ожидания, и запись из потока пула
+    ломала бы запросы основного потока.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        return True
+    return connection.vendor == "sqlite" and connection.is_in_memory_db()
+
+
+def _submit(post_id):
+    with _lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+    if _run_inline():
+        _generate(post_id)
+    else:
+        _get_executor().submit(_generate, post_id)
+
+
+def enqueue(post_id):
+    """ Ставит картинку поста в очередь после фиксации транзакции """
+    transaction.on_commit(lambda: _submit(post_id))
+
+
+def ready_card_images(post):
+    """ Готовый набор вариантов карточки или None """
+    if not post.image or not post.card_images:
+        return None
+    return json.loads(post.card_images)
+
+
+def prepare_missing(post_ids):
+    """ Готовит в текущем потоке наборы постов, у которых их нет """
+    prepared = 0
+    for post_id in post_ids:
+        _generate(post_id)
+        prepared += 1
+    return prepared
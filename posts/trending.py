@@ -0,0 +1,168 @@
+""" Популярные посты
+
+Рейтинг поста - сумма вкладов событий, каждый из которых убывает вдвое
+за TRENDING_HALF_LIFE_HOURS: сама публикация (вес 1), комментарии
+(TRENDING_COMMENT_WEIGHT) и новые подписчики автора
+(TRENDING_FOLLOW_WEIGHT, если пост вышел не раньше чем за
+TRENDING_FOLLOW_WINDOW_DAYS до подписки). Затухшая сумма - это скорость
+комментариев и подписок, сглаженная по времени.
+
+Все вклады затухают с одной скоростью, поэтому порядок постов со временем
+не меняется, пока не придут новые события. Рейтинг хранится логарифмом
+суммы, отсчитанным от EPOCH: вклад события - log(вес) + (t - EPOCH) / tau.
+Его не нужно пересчитывать по часам: update_trending только добавляет
+вклады постов, комментариев и подписок, появившихся после прошлого
+запуска, а /trending/ читает первые строки индекса post_trending_idx.
+
+Удаленные комментарии и подписки из рейтинга не вычитаются. Их, как и
+смену настроек, учитывает полный пересчет update_trending --full.
+"""
+import datetime as dt
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .generations import bump
+from .models import Comment, Follow, Post, TrendingCursor
+
+EPOCH = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def tau():
+    """ За сколько секунд вклад уменьшается в e раз """
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def contribution(weight, when):
+    """ Вклад события с весом weight в момент when, в логарифмах """
+    return math.log(weight) + (when - EPOCH).total_seconds() / tau()
+
+
+def combine(*scores):
+    """ Логарифм суммы вкладов, без переполнения exp; None пропускается """
+    scores = [score for score in scores if score is not None]
+    top = max(scores)
+    return top + math.log(sum(math.exp(score - top) for score in scores))
+
+
+def top_posts(posts):
+    """ Первые TRENDING_SIZE постов рейтинга - одно чтение по индексу """
+    return posts.filter(trending_score__isnull=False).order_by(
+        "-trending_score", "-id")[:settings.TRENDING_SIZE]
+
+
+def save_scores(scores, batch_size):
+    Post.objects.bulk_update(
+        [Post(pk=pk, trending_score=score) for pk, score in scores.items()],
+        ["trending_score"], batch_size=batch_size)
+
+
+def score_posts(after, upto, batch_size):
+    """ Новые посты получают вклад публикации """
+    if after >= upto:
+        return 0
+    posts = Post.objects.filter(pk__gt=after, pk__lte=upto).order_by("pk")
+    scores, scored = {}, 0
+    for pk, pub_date in posts.values_list("pk", "pub_date").iterator(
+            chunk_size=batch_size):
+        scores[pk] = contribution(1, pub_date)
+        if len(scores) >= batch_size:
+            save_scores(scores, batch_size)
+            scored += len(scores)
+            scores = {}
+    save_scores(scores, batch_size)
+    return scored + len(scores)
+
+
+def comment_events(after, upto, events):
+    weight = settings.TRENDING_COMMENT_WEIGHT
+    if weight <= 0 or after >= upto:
+        return
+    comments = Comment.objects.filter(pk__gt=after, pk__lte=upto)
+    for post_id, created in comments.values_list(
+            "post_id", "created").iterator():
+        events[post_id] = combine(events.get(post_id),
+                                  contribution(weight, created))
+
+
+def follow_events(after, upto, posts_upto, events):
+    """ Новый подписчик автора поднимает его недавние посты
+
+    Один запрос к постам на каждого автора с новыми подписчиками, по
+    индексу post_author_date_idx.
+    """
+    weight = settings.TRENDING_FOLLOW_WEIGHT
+    if weight <= 0 or after >= upto:
+        return
+    window = dt.timedelta(days=settings.TRENDING_FOLLOW_WINDOW_DAYS)
+    follows = {}
+    for author_id, created in Follow.objects.filter(
+            pk__gt=after, pk__lte=upto, created__isnull=False).values_list(
+                "author_id", "created").iterator():
+        follows.setdefault(author_id, []).append(created)
+    for author_id, dates in follows.items():
+        posts = Post.objects.order_by().filter(
+            author_id=author_id, pk__lte=posts_upto,
+            pub_date__gte=min(dates) - window, pub_date__lte=max(dates))
+        for pk, pub_date in posts.values_list("pk", "pub_date"):
+            for created in dates:
+                if pub_date <= created <= pub_date + window:
+                    events[pk] = combine(events.get(pk),
+                                         contribution(weight, created))
+
+
+def add_events(events, batch_size):
+    """ Прибавляет вклады events {id поста: вклад} к рейтингам постов """
+    post_ids = list(events)
+    for start in range(0, len(post_ids), batch_size):
+        current = Post.objects.order_by().filter(
+            pk__in=post_ids[start:start + batch_size]).values_list(
+                "pk", "trending_score")
+        save_scores({pk: combine(score, events[pk])
+                     for pk, score in current}, batch_size)
+
+
+def save_cursors(cursors, upper):
+    TrendingCursor.objects.bulk_create(
+        [TrendingCursor(source=source, last_id=last_id)
+         for source, last_id in upper.items() if source not in cursors])
+    for source, last_id in upper.items():
+        if source in cursors and cursors[source] != last_id:
+            TrendingCursor.objects.filter(source=source).update(
+                last_id=last_id)
+
+
+def update(full=False, batch_size=1000):
+    """ Учитывает в рейтинге события после прошлого запуска
+
+    Возвращает {"post": новых постов, "changed": изменившихся рейтингов}.
+    """
+    # запись вкладов и сдвиг курсоров - одна транзакция: упавший запуск
+    # не учтет одно событие дважды
+    with transaction.atomic():
+        if full:
+            TrendingCursor.objects.all().delete()
+            Post.objects.exclude(trending_score=None).update(
+                trending_score=None)
+        cursors = dict(TrendingCursor.objects.values_list(
+            "source", "last_id"))
+        # посты - последними: комментарий или подписка из этого запуска
+        # не сошлется на пост, которого запуск не увидит
+        upper = {}
+        for source, model in (("comment", Comment), ("follow", Follow),
+                              ("post", Post)):
+            last = model.objects.aggregate(last=Max("pk"))["last"] or 0
+            upper[source] = max(last, cursors.get(source, 0))
+        scored = score_posts(cursors.get("post", 0), upper["post"],
+                             batch_size)
+        events = {}
+        comment_events(cursors.get("comment", 0), upper["comment"], events)
+        follow_events(cursors.get("follow", 0), upper["follow"],
+                      upper["post"], events)
+        add_events(events, batch_size)
+        save_cursors(cursors, upper)
+    if scored or events:
+        bump("trending")
+    return {"post": scored, "changed": len(events)}
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = "posts"
 
@@ -13,7 +13,11 @@ urlpatterns = [
     path("<str:username>/<int:post_id>/comment/",
          views.add_comment,
          name="add_comment"),
+    path("<str:username>/<int:post_id>/comments/",
+         views.more_comments,
+         name="comments"),
     path("follow/", views.view_follow_index, name="follow_index"),
+    path("trending/", views.trending_posts, name="trending"),
     path("<str:username>/follow/", views.profile_follow,
          name="profile_follow"),
     path("<str:username>/unfollow/", views.profile_unfollow,
@@ -21,6 +25,12 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name="group_slug"),
     path("group/", views.show_groups, name="show_groups"),
     path("new/", views.new_post, name="new_post"),
+    path("search/", views.search, name="search"),
+    path("search/api/", views.search_api, name="search_api"),
+    path("api/posts/", api.index, name="api_index"),
+    path("api/posts/batch/", api.posts_batch, name="api_posts_batch"),
+    path("api/group/<slug:slug>/", api.group, name="api_group"),
+    path("api/profile/<str:username>/", api.profile, name="api_profile"),
     path("<str:username>/", views.profile, name="profile"),
     path("<str:username>/<int:post_id>/", views.view_post, name="post"),
     # проверить name для edit_post либо new_post
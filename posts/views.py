@@ -1,22 +1,91 @@
+import hashlib
+
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, JsonResponse
 from django.core.paginator import Paginator
 from django.shortcuts import (get_list_or_404, get_object_or_404, redirect,
                               render)
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 
+from . import feed, threads, thumbnails, trending
+from .search import search_posts
+from .generations import feed_cache_context, page_etag
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, ProfileStats
+from .paginator import CursorPaginator, merge_sources
 
 
 def follow_authors_context(request):
-    """ передает список подписки на авторов для оформления кнопок """
+    """ передает множество id авторов из подписок для оформления кнопок """
     if not request.user.is_authenticated:
         return None
-    links = Follow.objects.filter(user=request.user)
-    authors = [link.author.id for link in links]
-    return authors
+    return feed.followed_author_ids(request.user)
+
+
+def conditional_page(etag_func):
+    """ Отвечает 304 без рендера, если ETag страницы не изменился
+
+    ETag собирается из поколений лент, поэтому считается без запросов к
+    ленте. no-cache заставляет браузер и прокси переспрашивать сервер, а
+    Vary: Cookie не дает отдать чужую страницу другому читателю.
+    """
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+        return vary_on_cookie(cache_control(no_cache=True)(view))
+    return decorator
+
+
+def index_etag(request):
+    return page_etag(request, "index")
+
+
+def trending_etag(request):
+    return page_etag(request, "index", "trending")
+
+
+def requested_group(request, slug):
+    """ Сообщество страницы: ETag и вьюха ищут его одним запросом """
+    if not hasattr(request, "_group"):
+        request._group = Group.objects.filter(slug=slug).first()
+    return request._group
+
+
+def group_etag(request, slug=None):
+    group = requested_group(request, slug)
+    if group is None:
+        return None
+    return page_etag(request, f"group:{group.pk}")
+
+
+def profile_etag(request, username, post_id=None):
+    """ Профиль и страница поста: посты, комментарии и подписки автора """
+    user_id = get_user_model().objects.filter(
+        username=username).values_list("pk", flat=True).first()
+    if user_id is None:
+        return None
+    return page_etag(request, f"profile:{user_id}", f"relations:{user_id}")
+
+
+def post_etag(request, username, post_id):
+    """ Страница поста: у вошедшего на ней еще и форма с CSRF-токеном
+
+    Токен меняется при входе и выходе, поэтому входит в ETag. Без куки
+    CSRF страница получит новый токен, и ответ всегда полный.
+    """
+    etag = profile_etag(request, username)
+    if etag is None or not request.user.is_authenticated:
+        return etag
+    csrf_token = request.META.get("CSRF_COOKIE")
+    if csrf_token is None:
+        return None
+    return hashlib.md5(f"{etag}|{csrf_token}".encode()).hexdigest()
 
 
 @login_required
@@ -24,11 +93,15 @@ def view_follow_index(request):
     """ Вывод ленты подписок пользователя """
     # собираем все подписки пользователя
     authors = follow_authors_context(request)
-    posts = Post.objects.prefetch_related("author").filter(author__in=authors)
-
-    page, paginator = get_page(request, posts)
+    # id постов берем из материализованной ленты, сами посты - одним запросом
+    page, paginator = get_page(request,
+                               feed.follow_feed_sources(request.user),
+                               keys=("pub_date", "post_id"))
+    page.object_list = feed.hydrate(page.object_list)
     context = {"page": page, "paginator": paginator, "follow_index": True,
                "username": request.user, "authors": authors}
+    # лента подписок меняется вместе с любым постом и подписками читателя
+    context.update(feed_cache_context(request, "index"))
 
     return render(request, "index.html", context)
 
@@ -41,9 +114,8 @@ def profile_follow(request, username):
         return redirect("posts:index")
     user = get_object_or_404(get_user_model(), username=request.user)
     author = get_object_or_404(get_user_model(), username=username)
-    count = Follow.objects.filter(user=user, author=author).count()
-    if not count:
-        Follow.objects.create(user=user, author=author)
+    # повторная подписка запрещена ограничением follow-constraint
+    Follow.objects.get_or_create(user=user, author=author)
     # TODO: проверить, что редирект с нашего сайта
     redirect_link = request.GET.get("next")
     # вернем пользователя туда откуда пришёл
@@ -71,45 +143,76 @@ def profile_unfollow(request, username):
         return redirect("/")
 
 
-def get_page(request, object_list):
-    """ Возвращает контекст page от paginator """
-    loc_paginator = Paginator(object_list, 10)
+def get_page(request, object_list, keys=("pub_date", "id")):
+    """ Возвращает контекст page от paginator
+
+    Курсорный режим включается настройкой POSTS_PAGINATION = "cursor"
+    или параметрами ?after=/?before= в запросе, иначе - номера страниц.
+    """
+    if (settings.POSTS_PAGINATION == "cursor"
+            or "after" in request.GET or "before" in request.GET):
+        loc_paginator = CursorPaginator(object_list, 10, keys)
+        page = loc_paginator.get_page(request.GET.get("after"),
+                                      request.GET.get("before"))
+        return page, loc_paginator
+
+    loc_paginator = Paginator(merge_sources(object_list, keys), 10)
     page_number = request.GET.get("page")
     return loc_paginator.get_page(page_number), loc_paginator
 
 
 def get_profile_data_dict(username, add_context=None):
     """ Возвращает словарь с данными профиля и объектом пользователя """
-    user = get_object_or_404(get_user_model(), username=username)
+    # счетчики профиля приходят тем же запросом, что и пользователь
+    user = get_object_or_404(
+        get_user_model().objects.select_related("stats"), username=username)
+    stats = ProfileStats.for_user(user)
     context = {
         "username": user,
-        "posts_count": Post.objects.filter(author=user).count(),
+        "posts_count": stats.posts_count,
+        "followers": stats.followers_count,
+        "following": stats.following_count,
     }
     if add_context:
         context.update(add_context)
     return context
 
 
+@conditional_page(index_etag)
 def index(request):
     """ Вывод последних 10 постов из базы """
-    post_list = Post.objects.prefetch_related("author").all()
-    page, paginator = get_page(request, post_list)
+    page, paginator = get_page(request, feed.post_cards())
     context = {"page": page, "paginator": paginator}
 
     authors = follow_authors_context(request)
     context.update({"authors": authors})
+    context.update(feed_cache_context(request, "index"))
     return render(request, "index.html", context)
 
 
+@conditional_page(trending_etag)
+def trending_posts(request):
+    """ Популярные посты: верх рейтинга, посчитанного update_trending """
+    posts = trending.top_posts(feed.post_cards())
+    context = {"posts": posts, "trending": True,
+               "authors": follow_authors_context(request)}
+    # карточки меняются вместе с главной, порядок - после update_trending
+    context.update(feed_cache_context(request, "index", "trending"))
+    return render(request, "trending.html", context)
+
+
+@conditional_page(group_etag)
 def group_posts(request, slug=None):
-    # Получаем объект из базы соответствующий slug
-    group = get_object_or_404(Group, slug=slug)
+    # Получаем объект из базы соответствующий slug (его уже нашел ETag)
+    group = requested_group(request, slug)
+    if group is None:
+        raise Http404("Нет такого сообщества")
     # Получаем все посты принадлежащие slug через related_name
-    posts = group.posts.prefetch_related("author").all()
-    page, paginator = get_page(request, posts)
+    page, paginator = get_page(request, feed.post_cards(group.posts.all()))
     # передаем paginator в контекст чтобы пройти тест
     context = {"group": group, "page": page, "paginator": paginator,
                "authors": follow_authors_context(request)}
+    context.update(feed_cache_context(request, f"group:{group.pk}"))
 
     return render(request, "group.html", context)
 
@@ -120,61 +223,149 @@ def show_groups(request):
     return render(request, "show_groups.html", {"groups": groups})
 
 
+@conditional_page(profile_etag)
 def profile(request, username):
     """ Выводит профиль пользователя и его посты """
     # цепляем данные профиля
     context = get_profile_data_dict(username)
-    posts = context["username"].posts.prefetch_related("author").all()
-    page, paginator = get_page(request, posts)  # костыль paginator для тестов
-    author = get_object_or_404(get_user_model(), username=username)
+    user = context["username"]
+    # костыль paginator для тестов
+    page, paginator = get_page(request, feed.post_cards(user.posts.all()))
     # подписан ли текущий пользователь на того что в профиле
-    following = 0  # на скольких подписан
-    followers = 0  # сколько подписчиков
     following_this_author = False
     if request.user.is_authenticated:
-        if Follow.objects.filter(user=request.user, author=author).exists():
-            following_this_author = True
-    user = context["username"]
-    following = user.follower.count()
-    followers = user.following.count()
-    following_list = user.follower.all()  # на кого подписан
-    # followers_list = Follow.objects.filter(author=user)  # кто его читает
-    followers_list = user.following.all()  # кто его читает
+        following_this_author = user.pk in follow_authors_context(request)
+    # на кого подписан
+    following_list = user.follower.select_related("author")
+    # кто его читает
+    followers_list = user.following.select_related("user")
 
     context.update({"page": page, "paginator": paginator,
-                    "following": following, "followers": followers,
                     "following_this_author": following_this_author,
                     "following_list": following_list,
                     "followers_list": followers_list})
+    # в профиле кнопок подписки в карточках нет, важно лишь автор ли читает
+    role = "author" if request.user == user else "reader"
+    context.update(feed_cache_context(request, f"profile:{user.pk}",
+                                      viewer=role))
 
     # обязательно отдаем username, на случай если нет постов
     return render(request, "profile.html", context)
 
 
+def post_comments(post_id):
+    """ Комментарии поста в порядке веток вместе с авторами """
+    # порядок совпадает с индексом comment_post_path_idx
+    return (Comment.objects.filter(post_id=post_id)
+            .select_related("author").order_by("path"))
+
+
+def thread_root(request, post_id):
+    """ Путь комментария из ?thread=, если нужна только его ветка """
+    thread = request.GET.get("thread", "")
+    if not thread:
+        return None
+    if not thread.isdigit():
+        raise Http404("Неверная ветка")
+    path = Comment.objects.filter(pk=thread, post_id=post_id).values_list(
+        "path", flat=True).first()
+    if path is None:
+        raise Http404("Нет такой ветки")
+    return path
+
+
+def get_comments_page(request, post_id):
+    """ Порция комментариев после пути ?after=, всех или одной ветки """
+    return threads.thread_page(post_comments(post_id),
+                               settings.COMMENTS_PER_PAGE,
+                               after=request.GET.get("after"),
+                               root=thread_root(request, post_id))
+
+
+def wants_json(request):
+    return "application/json" in request.META.get("HTTP_ACCEPT", "")
+
+
+def wants_fragment(request):
+    """ Запрос из скрипта страницы: ответить кусочком, а не редиректом """
+    return request.is_ajax() or wants_json(request)
+
+
+@conditional_page(post_etag)
 def view_post(request, username, post_id):
     """ Посмотреть пост под номером post_id """
     context = get_profile_data_dict(username)
-    post = get_object_or_404(Post, id=post_id,
-                             author__username=context["username"])
-    comments = Comment.objects.filter(post=post_id)
-    # Так не работает, потому что может не быть комментариев, тогда придет 404
-    # comments = get_list_or_404(Comment, post=post_id)
+    post = get_object_or_404(Post.objects.select_related("author", "group"),
+                             id=post_id, author__username=context["username"])
+    # на странице только первая порция, остальные - по кнопке "Показать ещё"
+    comments_page = get_comments_page(request, post.pk)
     form = CommentForm()
+    reply_to = request.GET.get("reply", "")
+    # comments - весь список ленивым запросом для тестов, в шаблоне
+    # выводится comments_page
     context.update({"post": post, "post_id": post_id,
-                    "comments": comments, "form": form})
+                    "comments": post_comments(post.pk),
+                    "comments_page": comments_page, "form": form,
+                    "thread": request.GET.get("thread", ""),
+                    "reply_to": reply_to if reply_to.isdigit() else ""})
     return render(request, "post.html", context)
 
 
+@conditional_page(profile_etag)
+def more_comments(request, username, post_id):
+    """ Следующая порция комментариев без страницы вокруг """
+    post = get_object_or_404(Post.objects.only("id"), id=post_id,
+                             author__username=username)
+    return render(request, "comments_page.html",
+                  {"comments_page": get_comments_page(request, post.pk),
+                   "thread": request.GET.get("thread", ""),
+                   "username": username, "post_id": post.pk})
+
+
+def comment_response(request, comment):
+    """ Только новый комментарий: HTML карточки или JSON с ней же """
+    html = render_to_string("comment_item.html", {"item": comment}, request)
+    if not wants_json(request):
+        return HttpResponse(html, status=201)
+    return JsonResponse({
+        "id": comment.pk,
+        "author": comment.author.username,
+        "text": comment.text,
+        "created": comment.created,
+        "parent": comment.parent_id,
+        "path": comment.path,
+        "html": html,
+    }, status=201, json_dumps_params={"ensure_ascii": False})
+
+
+def reply_parent(request, post):
+    """ Комментарий из поля parent, на который отвечают """
+    parent_id = request.POST.get("parent", "")
+    if not parent_id:
+        return None
+    if not parent_id.isdigit():
+        raise Http404("Неверный комментарий")
+    return get_object_or_404(
+        Comment.objects.only("id", "path", "parent_id", "post_id"),
+        pk=parent_id, post_id=post.pk)
+
+
 @login_required
 def add_comment(request, username, post_id):
     form = CommentForm(request.POST or None)
+    post = get_object_or_404(Post.objects.only("id"), id=post_id)
 
     if form.is_valid():
         comment = form.save(commit=False)
-        comment.author = get_object_or_404(get_user_model(),
-                                           username=request.user)
-        comment.post = get_object_or_404(Post, id=post_id)
+        comment.author = request.user
+        comment.post = post
+        comment.parent = reply_parent(request, post)
         comment.save()
+        if wants_fragment(request):
+            return comment_response(request, comment)
+    elif request.method == "POST" and wants_fragment(request):
+        return JsonResponse({"errors": form.errors}, status=400,
+                            json_dumps_params={"ensure_ascii": False})
     return redirect("posts:post", username, post_id)
 
 
@@ -206,7 +397,16 @@ def new_post(request, username=None, post_id=None):
     post = form.save(commit=False)
     post.pub_date = timezone.now()
     post.author = request.user
-    post.save()
+    if new_post:
+        post.save()
+    else:
+        # comments_count и trending_score пишут комментарии и
+        # update_trending - правка не затирает их значениями из формы
+        post.save(update_fields=["text", "group", "image", "image_width",
+                                 "image_height", "card_images", "pub_date"])
+    if "image" in form.changed_data and post.image:
+        # миниатюру готовим в фоне, а не при первом показе ленты
+        thumbnails.enqueue(post.pk)
     # если дошли сюда и пользователь совпадает, значит вернемся к посту
     if request.user.username == username:
         return redirect("posts:post", username, post_id)
@@ -214,6 +414,50 @@ def new_post(request, username=None, post_id=None):
     return redirect(reverse_lazy("posts:index"))
 
 
+def get_search_results(request):
+    """ Запрос, результаты и смещение следующей страницы поиска """
+    query = request.GET.get("q", "").strip()
+    try:
+        offset = max(int(request.GET.get("offset", 0)), 0)
+    except ValueError:
+        offset = 0
+    limit = settings.SEARCH_RESULTS_PER_PAGE
+    # просим на один результат больше, чтобы понять, есть ли продолжение
+    results = search_posts(query, limit=limit + 1, offset=offset)
+    next_offset = offset + limit if len(results) > limit else None
+    return query, results[:limit], next_offset
+
+
+def search(request):
+    """ Поиск по тексту постов """
+    query, results, next_offset = get_search_results(request)
+    return render(request, "search.html",
+                  {"query": query, "results": results,
+                   "next_offset": next_offset,
+                   "authors": follow_authors_context(request)})
+
+
+def search_api(request):
+    """ Поиск по тексту постов в JSON """
+    query, results, next_offset = get_search_results(request)
+    return JsonResponse({
+        "query": query,
+        "next_offset": next_offset,
+        "results": [
+            {"id": result.post.pk,
+             "author": result.post.author.username,
+             "group": result.post.group.slug if result.post.group else None,
+             "pub_date": result.post.pub_date,
+             "rank": result.rank,
+             "snippet": result.snippet,
+             "url": reverse("posts:post",
+                            args=[result.post.author.username,
+                                  result.post.pk])}
+            for result in results
+        ],
+    }, json_dumps_params={"ensure_ascii": False})
+
+
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию,
     # выводить её в шаблон пользователской страницы 404 мы не станем
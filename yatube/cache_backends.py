@@ -0,0 +1,259 @@
+""" Кэш в файле SQLite, общий для всех процессов на одном хосте
+
+LocMemCache у каждого воркера gunicorn свой: кэш холодный, а сброс
+поколений в одном воркере не виден остальным. Этот бэкенд хранит записи
+в одном файле SQLite в режиме WAL, поэтому читатели не блокируют друг
+друга, а запись одного процесса сразу видна всем.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "yatube.cache_backends.SQLiteCache",
+            "LOCATION": "/var/tmp/yatube-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 100000, "CULL_EVERY": 100},
+        }
+    }
+
+Целые числа хранятся как INTEGER, поэтому incr выполняется одним
+UPDATE и атомарен между процессами. При переполнении вытесняются давно
+не читанные записи (LRU с точностью до LRU_RESOLUTION секунд). Записи
+считаются не при каждой записи, а раз в CULL_EVERY записей потока, так
+что кэш может превысить MAX_ENTRIES на CULL_EVERY записей на поток.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# время последнего чтения обновляется не чаще раза в столько секунд,
+# чтобы каждое попадание в кэш не становилось записью в файл
+LRU_RESOLUTION = 1.0
+# COUNT(*) - просмотр всей таблицы, поэтому переполнение проверяется
+# раз в столько записей
+CULL_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+"""
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS") or {}
+        self._cull_every = max(int(options.get("CULL_EVERY", CULL_EVERY)), 1)
+        self._path = location
+        self._local = threading.local()
+
+    # соединения
+
+    def _connection(self):
+        """ Соединение свое у каждого потока и каждого процесса """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=30,
+                               isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, statements, cull=False):
+        """ Выполняет запросы в одной пишущей транзакции """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rowcounts = [conn.execute(sql, args).rowcount
+                         for sql, args in statements]
+            if cull and self._cull_due(len(statements)):
+                self._cull(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rowcounts
+
+    # сериализация
+
+    @staticmethod
+    def _dump(value):
+        # bool - тоже int, но incr к нему неприменим
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """ Абсолютное время истечения или None для вечных записей """
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return time.time() + max(timeout, 0)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    # чтение
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        key_map = {self._key(key, version): key for key in keys}
+        now = time.time()
+        placeholders = ",".join("?" * len(key_map))
+        rows = self._connection().execute(
+            f"SELECT key, value, accessed FROM cache "
+            f"WHERE key IN ({placeholders}) "
+            f"AND (expires IS NULL OR expires > ?)",
+            [*key_map, now]).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > LRU_RESOLUTION]
+        if stale:
+            self._touch_accessed(stale, now)
+        return {key_map[key]: self._load(value) for key, value, _ in rows}
+
+    def _touch_accessed(self, keys, now):
+        placeholders = ",".join("?" * len(keys))
+        try:
+            self._connection().execute(
+                f"UPDATE cache SET accessed = ? WHERE key IN ({placeholders})",
+                [now, *keys])
+        except sqlite3.OperationalError:
+            # файл занят писателем - отметка LRU не критична
+            pass
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            [key, time.time()]).fetchone()
+        return row is not None
+
+    # запись
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        statements = [
+            ("INSERT OR REPLACE INTO cache (key, value, expires, accessed) "
+             "VALUES (?, ?, ?, ?)",
+             [self._key(key, version), self._dump(value), expires, now])
+            for key, value in data.items()
+        ]
+        self._write(statements, cull=True)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        rowcounts = self._write([
+            ("DELETE FROM cache WHERE key = ? AND expires <= ?", [key, now]),
+            ("INSERT OR IGNORE INTO cache (key, value, expires, accessed) "
+             "VALUES (?, ?, ?, ?)",
+             [key, self._dump(value), self.get_backend_timeout(timeout),
+              now]),
+        ], cull=True)
+        return rowcounts[1] == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        rowcounts = self._write([
+            ("UPDATE cache SET expires = ? WHERE key = ? "
+             "AND (expires IS NULL OR expires > ?)",
+             [self.get_backend_timeout(timeout), key, time.time()]),
+        ])
+        return rowcounts[0] == 1
+
+    def incr(self, key, delta=1, version=None):
+        """ Атомарное увеличение одним UPDATE без чтения значения """
+        key = self._key(key, version)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = conn.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' "
+                "AND (expires IS NULL OR expires > ?)",
+                [delta, key, time.time()]).rowcount
+            row = conn.execute("SELECT value FROM cache WHERE key = ?",
+                               [key]).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if not updated:
+            raise ValueError(f"Key '{key}' not found or not an integer")
+        return row[0]
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ",".join("?" * len(keys))
+            self._write([(f"DELETE FROM cache WHERE key IN ({placeholders})",
+                          keys)])
+
+    def clear(self):
+        self._write([("DELETE FROM cache", [])])
+
+    def _cull_due(self, writes):
+        """ Пора ли проверить переполнение: счетчик записей потока """
+        writes += getattr(self._local, "writes", 0)
+        self._local.writes = writes % self._cull_every
+        return writes >= self._cull_every
+
+    def _cull(self, conn):
+        """ Удаляет истекшие, а при переполнении - давно не читанные записи """
+        count, = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count <= self._max_entries:
+            return
+        count -= conn.execute("DELETE FROM cache WHERE expires <= ?",
+                              [time.time()]).rowcount
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            conn.execute("DELETE FROM cache")
+            return
+        conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+            [count // self._cull_frequency])
+
+    def close(self, **kwargs):
+        # соединения живут до конца потока: закрывать их после каждого
+        # запроса значит заново открывать файл и применять PRAGMA
+        pass
@@ -0,0 +1,68 @@
+""" SQLite для нескольких воркеров: WAL, PRAGMA и BEGIN IMMEDIATE
+
+Стандартный бэкенд открывает базу с журналом отката: пишущий процесс
+блокирует всех читателей, а транзакция, начатая чтением, при попытке
+записи сразу получает "database is locked" - ожидание busy_timeout в
+этом случае не помогает. Этот бэкенд при открытии соединения применяет
+PRAGMA из OPTIONS["pragmas"] (WAL: читатели не ждут писателя) и
+начинает транзакции atomic() с BEGIN IMMEDIATE из
+OPTIONS["transaction_mode"]: блокировка записи берется в начале
+транзакции, где ее можно дождаться.
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "yatube.db_backend",
+            "NAME": "db.sqlite3",
+            "OPTIONS": {
+                "pragmas": {"journal_mode": "WAL", "busy_timeout": 5000},
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    }
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+# имя PRAGMA и значение подставляются в SQL: только слова и числа
+PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE = re.compile(r"^(-?\d+|[A-Za-z]+)$")
+FIRST = ("auto_vacuum", "journal_mode")
+
+
+def configure(conn, pragmas):
+    """ Применяет PRAGMA к открытому соединению sqlite3
+
+    auto_vacuum действует, только пока в файле ничего нет, поэтому идет
+    первым, journal_mode - следом: от него зависит смысл synchronous.
+    """
+    ordered = sorted(pragmas.items(),
+                     key=lambda item: FIRST.index(item[0])
+                     if item[0] in FIRST else len(FIRST))
+    for name, value in ordered:
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+            raise ImproperlyConfigured(f"Неверная PRAGMA {name}={value}")
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop("pragmas", {})
+        self.transaction_mode = params.pop("transaction_mode", None)
+        if self.transaction_mode not in (None, *TRANSACTION_MODES):
+            raise ImproperlyConfigured(
+                f"transaction_mode: одно из {', '.join(TRANSACTION_MODES)}")
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        configure(conn, self.pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
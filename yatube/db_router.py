@@ -0,0 +1,66 @@
+""" Чтение страниц лент с реплик базы
+
+ReplicaMiddleware (yatube.middleware.replicas) для GET-запросов к маршрутам из
+REPLICA_READ_VIEWS выбирает одну из реплик DATABASE_REPLICAS, и до конца
+запроса ReplicaRouter отправляет на нее чтения. Все записи идут в
+default. Если запрос что-то записал, следующие чтения этого запроса
+идут в default, а ответ получает куку, с которой страницы читаются из
+default еще REPLICA_STICKY_SECONDS: автор сразу видит свой пост или
+комментарий, даже если реплика отстает.
+
+Реплики - копии файла default, их обновляет команда sync_replicas.
+Сессии и пользователи всегда читаются из default: новая сессия или
+только что зарегистрированный пользователь появляются в реплике лишь
+после копирования, а без них пользователь выглядел бы вышедшим.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# приложения, которые читаются только из default
+PRIMARY_APPS = {"sessions", "auth"}
+
+_state = threading.local()
+
+
+def read_from(alias):
+    """ Чтения текущего запроса - с реплики alias """
+    _state.replica = alias
+
+
+def reset():
+    _state.replica = None
+    _state.wrote = False
+
+
+def current_replica():
+    """ Реплика, с которой сейчас читаются данные, или None """
+    if getattr(_state, "wrote", False):
+        return None
+    return getattr(_state, "replica", None)
+
+
+def wrote():
+    return getattr(_state, "wrote", False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на всех базах одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема приходит в реплики вместе с копией файла
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1 @@
+""" Middleware проекта, каждое - в своем модуле """
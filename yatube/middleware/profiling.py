@@ -0,0 +1,102 @@
+""" Профилирование отдельных запросов под cProfile
+
+ProfilingMiddleware по запросу персонала (?_profile=1 или заголовок
+X-Profile: 1) или для доли PROFILING_SAMPLE_RATE всех запросов выполняет
+страницу под cProfile и сохраняет .pstats в PROFILING_DIR. Список
+последних профилей - /admin/profiles/.
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger("yatube.requests")
+
+PROFILE_NAME = re.compile(r"^[\w.-]+\.pstats$")
+
+
+def profile_path(name):
+    """ Путь к файлу профиля или None, если имя не похоже на наше """
+    if not PROFILE_NAME.match(name):
+        return None
+    return os.path.join(settings.PROFILING_DIR, name)
+
+
+def list_profiles():
+    """ Профили от новых к старым """
+    try:
+        names = [name for name in os.listdir(settings.PROFILING_DIR)
+                 if PROFILE_NAME.match(name)]
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(settings.PROFILING_DIR, name))
+        except FileNotFoundError:
+            # удален ротацией в другом процессе
+            continue
+        entries.append({"name": name, "size": stat.st_size,
+                        "created": stat.st_mtime})
+    return sorted(entries, key=lambda entry: entry["created"], reverse=True)
+
+
+def _rotate():
+    for entry in list_profiles()[settings.PROFILING_KEEP:]:
+        try:
+            os.remove(os.path.join(settings.PROFILING_DIR, entry["name"]))
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """ Профилирование отдельных запросов в рабочем окружении
+
+    Стоит после AuthenticationMiddleware: запрос на профиль принимается
+    только от персонала, иначе параметр и заголовок игнорируются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def requested(self, request):
+        asked = (request.GET.get(settings.PROFILING_PARAM)
+                 or request.META.get("HTTP_X_PROFILE"))
+        return bool(asked) and request.user.is_staff
+
+    def sampled(self):
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        requested = self.requested(request)
+        if not requested and not self.sampled():
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        view_name = match.view_name if match else "unresolved"
+        name = "{}-{}-{}-{:.0f}ms.pstats".format(
+            time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:8],
+            re.sub(r"[^\w.-]", "_", view_name), elapsed_ms)
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(settings.PROFILING_DIR, name))
+        _rotate()
+        logger.info("Профиль %s: %s %.0f мс", name, request.path,
+                    elapsed_ms)
+        if requested:
+            response["X-Profile"] = name
+        return response
@@ -0,0 +1,126 @@
+""" Ограничение частоты записей
+
+RateLimitMiddleware ограничивает частоту записей по корзинам жетонов из
+RATE_LIMITS: отдельно для сессии пользователя и для адреса клиента.
+Корзины и счетчики срабатываний лежат в кэше, в базу проверка не ходит.
+Сверх
+лимита - ответ 429 с Retry-After, счетчики - /admin/rate-limits/.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger("yatube.requests")
+
+RATE_LIMIT_PREFIX = "ratelimit"
+
+
+def _refill(state, capacity, period, now):
+    """ Жетонов в корзине к моменту now; полная корзина, если ее нет """
+    if state is None:
+        return float(capacity)
+    tokens, stamp = state
+    return min(float(capacity),
+               tokens + max(now - stamp, 0) * capacity / period)
+
+
+def trip_counters():
+    """ {имя маршрута: {"user": n, "ip": n}} срабатываний ограничения """
+    keys = {f"{RATE_LIMIT_PREFIX}:trips:{name}:{scope}": (name, scope)
+            for name in settings.RATE_LIMITS for scope in ("user", "ip")}
+    found = cache.get_many(keys)
+    counters = {name: {"user": 0, "ip": 0} for name in settings.RATE_LIMITS}
+    for key, (name, scope) in keys.items():
+        counters[name][scope] = found.get(key, 0)
+    return counters
+
+
+def _count_trip(name, scope):
+    key = f"{RATE_LIMIT_PREFIX}:trips:{name}:{scope}"
+    # add не перезапишет счетчик, уже заведенный другим процессом
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # ключ вытеснен между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+class RateLimitMiddleware:
+    """ Корзины жетонов для маршрутов записи
+
+    Проверка стоит в process_view, где уже известно имя маршрута.
+    Корзина "user" привязана к куке сессии, а не к request.user: ни
+    сессия, ни пользователь не читаются из базы, даже при сессиях в базе.
+    У пользователя с несколькими входами корзин несколько, общий предел
+    для них - корзина адреса. Подделанная кука дает новую корзину, но
+    запись без настоящей сессии отклонит сама вьюха. Отклоненный
+    запрос жетонов не тратит. Чтение и запись корзины не атомарны: при
+    гонке нескольких процессов лимит может быть превышен на единицы,
+    для защиты от залпа записей этого достаточно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def identities(self, request, rule):
+        """ (scope, ключ корзины, (N, секунд)) для правила маршрута """
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if session_key and "user" in rule:
+            # сам ключ сессии в кэш не попадает
+            digest = hashlib.md5(session_key.encode()).hexdigest()
+            yield "user", f"session:{digest}", rule["user"]
+        address = request.META.get(settings.RATE_LIMIT_IP_META)
+        if address and "ip" in rule:
+            yield "ip", f"ip:{address}", rule["ip"]
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        rule = settings.RATE_LIMITS.get(match.view_name if match else None)
+        if not rule or request.method not in rule.get(
+                "methods", ("GET", "POST")):
+            return None
+
+        now = time.time()
+        buckets = {f"{RATE_LIMIT_PREFIX}:{match.view_name}:{key}":
+                   (scope, limit)
+                   for scope, key, limit in self.identities(request, rule)}
+        states = cache.get_many(buckets)
+        updated, wait, tripped = {}, 0.0, []
+        for key, (scope, (capacity, period)) in buckets.items():
+            tokens = _refill(states.get(key), capacity, period, now)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) * period / capacity)
+                tripped.append(scope)
+            updated[key] = (tokens - 1, now)
+        if not tripped:
+            # пустая корзина через period наполнится сама - ключ не нужен
+            for key, (_, (_, period)) in buckets.items():
+                cache.set(key, updated[key], timeout=math.ceil(period))
+            return None
+
+        for scope in tripped:
+            _count_trip(match.view_name, scope)
+        retry_after = max(math.ceil(wait), 1)
+        logger.warning("%s: лимит записей (%s), повтор через %d с (%s)",
+                       match.view_name, ", ".join(tripped), retry_after,
+                       request.path)
+        message = f"Слишком много запросов, повторите через {retry_after} с"
+        if request.is_ajax() or "application/json" in request.META.get(
+                "HTTP_ACCEPT", ""):
+            response = JsonResponse({"error": message,
+                                     "retry_after": retry_after}, status=429,
+                                    json_dumps_params={"ensure_ascii": False})
+        else:
+            response = HttpResponse(message, status=429,
+                                    content_type="text/plain; charset=utf-8")
+        response["Retry-After"] = str(retry_after)
+        return response
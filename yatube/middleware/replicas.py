@@ -0,0 +1,43 @@
+""" Чтение страниц лент с реплик базы
+
+ReplicaMiddleware выбирает реплику для страниц только для чтения, а
+ReplicaRouter отправляет на нее чтения запроса (см. yatube.db_router).
+"""
+import random
+
+from django.conf import settings
+
+from yatube import db_router
+
+
+class ReplicaMiddleware:
+    """ Выбор реплики для страниц только для чтения
+
+    Стоит перед SessionMiddleware: запись сессии в ответе тоже считается
+    записью и включает чтение из default для этого читателя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.reset()
+        try:
+            response = self.get_response(request)
+            wrote = db_router.wrote()
+        finally:
+            db_router.reset()
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE, "1",
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite="Lax")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if (settings.DATABASE_REPLICAS
+                and request.method in ("GET", "HEAD")
+                and match.view_name in settings.REPLICA_READ_VIEWS
+                and settings.REPLICA_STICKY_COOKIE not in request.COOKIES):
+            db_router.read_from(
+                random.choice(list(settings.DATABASE_REPLICAS)))
@@ -0,0 +1,136 @@
+""" Замеры запросов к базе и времени ответа по каждой странице
+
+RequestStatsMiddleware считает для каждого запроса число SQL-запросов,
+время в базе, время рендера шаблонов (его засекает бэкенд шаблонов
+yatube.template_backends) и общее время, пишет их в лог
+"yatube.requests", в заголовки ответа (X-Query-Count, Server-Timing) и
+копит сводку по имени маршрута (posts:index, posts:profile...). Сводку
+процесса показывает /admin/request-stats/ для персонала.
+
+Если число запросов превышает бюджет из QUERY_BUDGETS_FILE, в лог
+пишется предупреждение. Те же бюджеты проверяют тесты
+(posts/tests/test_query_budgets.py).
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("yatube.requests")
+
+_local = threading.local()
+_stats = {}
+_stats_lock = threading.Lock()
+_budgets = None
+
+
+def load_query_budgets():
+    """ {имя маршрута: {"anonymous": n, "user": n}} из файла бюджетов """
+    global _budgets
+    if _budgets is None:
+        with open(settings.QUERY_BUDGETS_FILE, encoding="utf-8") as file:
+            _budgets = json.load(file)
+    return _budgets
+
+
+def query_budget(view_name, authenticated):
+    budget = load_query_budgets().get(view_name)
+    if budget is None:
+        return None
+    return budget["user" if authenticated else "anonymous"]
+
+
+class _Timer:
+    """ Накопитель замеров текущего запроса """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def current_timer():
+    """ Замеры запроса, который сейчас обрабатывает этот поток, или None """
+    return getattr(_local, "timer", None)
+
+
+def stats_snapshot():
+    """ Сводка процесса: копия, чтобы не держать блокировку при выводе """
+    with _stats_lock:
+        return {name: dict(row) for name, row in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _record(view_name, queries, sql_ms, template_ms, total_ms):
+    with _stats_lock:
+        row = _stats.setdefault(view_name, {
+            "requests": 0, "queries": 0, "max_queries": 0,
+            "sql_ms": 0.0, "template_ms": 0.0, "total_ms": 0.0,
+            "max_total_ms": 0.0,
+        })
+        row["requests"] += 1
+        row["queries"] += queries
+        row["max_queries"] = max(row["max_queries"], queries)
+        row["sql_ms"] += sql_ms
+        row["template_ms"] += template_ms
+        row["total_ms"] += total_ms
+        row["max_total_ms"] = max(row["max_total_ms"], total_ms)
+
+
+class RequestStatsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _Timer()
+        _local.timer = timer
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            _local.timer = None
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        view_name = match.view_name if match else "<unresolved>"
+        sql_ms = timer.sql_time * 1000
+        template_ms = timer.template_time * 1000
+        total_ms = total * 1000
+        _record(view_name, timer.queries, sql_ms, template_ms, total_ms)
+
+        response["X-Query-Count"] = str(timer.queries)
+        response["Server-Timing"] = (f"db;dur={sql_ms:.1f}, "
+                                     f"tpl;dur={template_ms:.1f}, "
+                                     f"total;dur={total_ms:.1f}")
+        logger.info("%s %s %s queries=%d sql=%.1fms templates=%.1fms "
+                    "total=%.1fms", request.method, request.path, view_name,
+                    timer.queries, sql_ms, template_ms, total_ms)
+        if view_name not in load_query_budgets():
+            return response
+        user = getattr(request, "user", None)
+        budget = query_budget(view_name,
+                              bool(user and user.is_authenticated))
+        if budget is not None and timer.queries > budget:
+            logger.warning("%s: %d запросов при бюджете %d (%s)",
+                           view_name, timer.queries, budget, request.path)
+        return response
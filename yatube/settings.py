@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -35,7 +36,7 @@ ALLOWED_HOSTS = [
 
 # Application definition
 INSTALLED_APPS = [
-    'posts',
+    'posts.apps.PostsConfig',
     'users',
     'about',
     'django.contrib.admin',
@@ -48,11 +49,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы в замеры попали запросы сессии и пользователя
+    'yatube.middleware.request_stats.RequestStatsMiddleware',
+    # до SessionMiddleware: запись сессии в ответе тоже учитывается
+    'yatube.middleware.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # после AuthenticationMiddleware: профиль по запросу - только персоналу
+    'yatube.middleware.profiling.ProfilingMiddleware',
+    # в process_view, до вьюхи записи; сессию из базы не читает
+    'yatube.middleware.rate_limit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,6 +71,16 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
     }
 }
+# при нескольких воркерах кэш (и поколения лент) должен быть общим:
+# задайте путь к файлу в YATUBE_CACHE_LOCATION
+if os.environ.get('YATUBE_CACHE_LOCATION'):
+    CACHES['default'] = {
+        'BACKEND': 'yatube.cache_backends.SQLiteCache',
+        'LOCATION': os.environ['YATUBE_CACHE_LOCATION'],
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
 
 ROOT_URLCONF = 'yatube.urls'
 
@@ -72,7 +91,8 @@ TEMPLATES_USERS = os.path.join(BASE_DIR, "users/templates/users")
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, засекающий время рендера для Server-Timing
+        'BACKEND': 'yatube.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR, TEMPLATES_POSTS, TEMPLATES_ABOUT,
                  TEMPLATES_USERS],
         'APP_DIRS': True,
@@ -95,13 +115,71 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# PRAGMA каждого соединения (yatube.db_backend): WAL - читатели не ждут
+# писателя, synchronous=NORMAL в WAL не теряет целостность при сбое,
+# cache_size в КиБ (минус), mmap_size в байтах, busy_timeout в мс
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+    # освобожденные страницы возвращает dbmaintain --vacuum; у базы,
+    # созданной без этого режима, его включит первый dbmaintain
+    'auto_vacuum': 'INCREMENTAL',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.db_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            # atomic() сразу берет блокировку записи и ждет ее
+            # busy_timeout, а не падает с "database is locked" посередине
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# реплики только для чтения - копии db.sqlite3, которые обновляет
+# команда sync_replicas: YATUBE_DB_REPLICAS="/var/db/r1.sqlite3,..."
+DATABASE_REPLICAS = {
+    f'replica{number}': os.path.abspath(path)
+    for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1)
+}
+for alias, path in DATABASE_REPLICAS.items():
+    DATABASES[alias] = {
+        'ENGINE': 'yatube.db_backend',
+        # только чтение: запись мимо роутера упадет, а не разойдется
+        'NAME': f'file:{path}?mode=ro',
+        # режим журнала и auto_vacuum реплики задает sync_replicas
+        'OPTIONS': {'pragmas': {
+            name: value for name, value in SQLITE_PRAGMAS.items()
+            if name not in ('journal_mode', 'synchronous', 'auto_vacuum')
+        }},
+        # в тестах реплики - та же база, что и default
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['yatube.db_router.ReplicaRouter']
+# страницы, которые читаются с реплик
+REPLICA_READ_VIEWS = [
+    'posts:index',
+    'posts:group_slug',
+    'posts:profile',
+    'posts:post',
+    'posts:comments',
+    'posts:show_groups',
+    'posts:trending',
+]
+# после записи страницы читаются из default столько секунд: больше, чем
+# реплика отстает между запусками sync_replicas
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'primary_reads'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -158,3 +236,79 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'send_emails')
 
+
+# лента подписок
+# посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам при записи, а подтягиваются при чтении; пропущенное раскладывает
+# fan_out_backlog, когда автор снова укладывается в лимит
+FEED_FANOUT_LIMIT = 1000
+
+# пагинация лент: "page" - по номерам страниц, "cursor" - по ключу
+# (pub_date, id) без COUNT(*) и OFFSET
+POSTS_PAGINATION = "page"
+
+# сколько секунд хранить в кэше множество подписок пользователя,
+# при подписке/отписке оно сбрасывается сразу
+FOLLOW_SET_TIMEOUT = 60 * 60
+
+# фрагменты лент живут долго: устаревают они сменой поколения при записи
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# потоков для фоновой подготовки миниатюр картинок
+THUMBNAIL_WORKERS = 2
+
+# ширины вариантов картинки карточки для srcset (WebP и исходный формат)
+POST_IMAGE_WIDTHS = (480, 960)
+
+# бэкенд полнотекстового поиска: FTS5 на SQLite,
+# posts.search.SimpleSearchBackend - для баз без полнотекстового индекса
+SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+SEARCH_RESULTS_PER_PAGE = 10
+
+# комментариев на странице поста и в каждой подгрузке "Показать ещё"
+COMMENTS_PER_PAGE = 20
+
+# популярные посты (posts.trending): вклад события убывает вдвое за
+# TRENDING_HALF_LIFE_HOURS; комментарий весит TRENDING_COMMENT_WEIGHT
+# публикаций, новый подписчик автора - TRENDING_FOLLOW_WEIGHT для его
+# постов за последние TRENDING_FOLLOW_WINDOW_DAYS. После смены этих
+# настроек нужен update_trending --full
+TRENDING_HALF_LIFE_HOURS = 12
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_FOLLOW_WEIGHT = 2.0
+TRENDING_FOLLOW_WINDOW_DAYS = 3
+# постов на странице /trending/
+TRENDING_SIZE = 20
+
+# допустимое число SQL-запросов на страницу (гость/вошедший пользователь);
+# превышение пишется в лог и роняет тесты
+QUERY_BUDGETS_FILE = os.path.join(BASE_DIR, 'yatube', 'query_budgets.json')
+
+# профилирование запросов под cProfile (yatube.middleware.profiling):
+# персонал включает его параметром ?_profile=1 или заголовком X-Profile: 1,
+# PROFILING_SAMPLE_RATE - доля всех запросов, профилируемых без спроса
+PROFILING_DIR = os.environ.get(
+    'YATUBE_PROFILING_DIR',
+    os.path.join(tempfile.gettempdir(), 'yatube-profiles'))
+PROFILING_PARAM = '_profile'
+PROFILING_SAMPLE_RATE = 0.0
+# сколько последних .pstats хранить
+PROFILING_KEEP = 50
+
+# ограничение частоты записей (yatube.middleware.rate_limit):
+# имя маршрута -> методы и корзины жетонов для сессии и адреса,
+# (N, секунд) - не больше N запросов подряд, затем N за столько секунд.
+# Корзины живут в кэше, пустой словарь выключает ограничение
+RATE_LIMITS = {
+    'posts:new_post': {'methods': ['POST'],
+                       'user': (10, 60), 'ip': (30, 60)},
+    'posts:edit_post': {'methods': ['POST'],
+                        'user': (20, 60), 'ip': (60, 60)},
+    'posts:add_comment': {'methods': ['POST'],
+                          'user': (20, 60), 'ip': (60, 60)},
+    'posts:profile_follow': {'user': (30, 60), 'ip': (90, 60)},
+    'posts:profile_unfollow': {'user': (30, 60), 'ip': (90, 60)},
+}
+# откуда брать адрес клиента: за прокси - заголовок с настоящим адресом,
+# например 'HTTP_X_REAL_IP'
+RATE_LIMIT_IP_META = 'REMOTE_ADDR'
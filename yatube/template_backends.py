@@ -0,0 +1,43 @@
+""" Шаблоны Django с замером времени рендера
+
+Сигнал template_rendered Django шлет только в тестах, поэтому время
+шаблонов для RequestStatsMiddleware засекает шаблон этого бэкенда. Вне
+запроса (команды, задачи) замер не ведется.
+
+    TEMPLATES = [{"BACKEND": "yatube.template_backends.TimedDjangoTemplates",
+                  ...}]
+"""
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .middleware.request_stats import current_timer
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timer = current_timer()
+        if timer is None:
+            return super().render(context, request)
+        # render_to_string внутри шаблона (теги, фильтры) не считаем дважды
+        timer.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer.template_depth -= 1
+            if not timer.template_depth:
+                timer.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name),
+                                 self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,31 @@
+""" Помощники для тестов проекта """
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .middleware.request_stats import query_budget
+
+
+class QueryBudgetMixin:
+    """ Проверка страницы по бюджету запросов из QUERY_BUDGETS_FILE
+
+    Кэш перед запросом очищается: бюджет задан для холодной страницы,
+    когда фрагменты лент еще не закэшированы.
+    """
+
+    def assertWithinQueryBudget(self, client, url, data=None):
+        """ Ответ на GET url в пределах бюджета своего маршрута """
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200, url)
+        view_name = response.resolver_match.view_name
+        budget = query_budget(view_name,
+                              response.wsgi_request.user.is_authenticated)
+        self.assertIsNotNone(budget, f"Нет бюджета запросов для {view_name}")
+        sql = "\n".join(query["sql"] for query in queries.captured_queries)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{view_name} ({url}): {len(queries)} запросов при бюджете "
+            f"{budget}\n{sql}")
+        return response
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from yatube.cache_backends import SQLiteCache
+
+
+def incr_many(location, count):
+    cache = SQLiteCache(location, {})
+    for _ in range(count):
+        cache.incr("counter")
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "cache.sqlite3")
+        self.cache = SQLiteCache(self.location,
+                                 {"OPTIONS": {"MAX_ENTRIES": 10,
+                                              "CULL_FREQUENCY": 2,
+                                              "CULL_EVERY": 1}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        self.cache.set("post", {"id": 1, "text": "Пост"})
+        self.assertEqual(self.cache.get("post"), {"id": 1, "text": "Пост"})
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertFalse(self.cache.add("post", "другое"))
+        self.assertTrue(self.cache.add("new", True))
+        self.assertIs(self.cache.get("new"), True)
+        self.cache.delete("post")
+        self.assertFalse(self.cache.has_key("post"))
+        self.cache.set_many({"a": 1, "b": 2})
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]),
+                         {"a": 1, "b": 2})
+
+    def test_expiry(self):
+        self.cache.set("short", "value", 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("short"))
+        self.assertTrue(self.cache.add("short", "again"))
+
+    def test_incr(self):
+        self.cache.set("counter", 1)
+        self.assertEqual(self.cache.incr("counter", 5), 6)
+        self.assertEqual(self.cache.decr("counter"), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_incr_shared_between_processes(self):
+        """ Другой процесс видит запись, incr не теряет обновлений """
+        self.cache.set("counter", 0, None)
+        workers = [multiprocessing.Process(target=incr_many,
+                                           args=(self.location, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get("counter"), 200)
+
+    def test_cull_every(self):
+        """ Записи пересчитываются раз в CULL_EVERY записей """
+        cache = SQLiteCache(self.location, {"OPTIONS": {"CULL_EVERY": 5}})
+        statements = []
+        cache._connection().set_trace_callback(statements.append)
+        counts = []
+        for number in range(10):
+            cache.set(f"key-{number}", number)
+            counts.append(sum("COUNT(*)" in sql for sql in statements))
+        self.assertEqual(counts, [0, 0, 0, 0, 1, 1, 1, 1, 1, 2])
+
+    def test_lru_eviction(self):
+        """ При переполнении вытесняются давно не читанные записи """
+        for number in range(10):
+            self.cache.set(f"key-{number}", number)
+        # первая запись прочитана позже остальных
+        self.cache._connection().execute(
+            "UPDATE cache SET accessed = ? WHERE key = ?",
+            [time.time() + 1, self.cache.make_key("key-0")])
+        self.cache.set("key-10", 10)
+        self.assertEqual(self.cache.get("key-0"), 0)
+        self.assertIsNone(self.cache.get("key-1"))
+        self.assertEqual(self.cache.get("key-10"), 10)
@@ -0,0 +1,82 @@
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+
+
+class SQLiteBackendTests(TransactionTestCase):
+    """ yatube.db_backend на отдельном файле базы
+
+    Псевдоним "tuned" появляется только в setUp, поэтому в databases его
+    не перечислить; default объявлен, чтобы раннер (и pytest-django)
+    разрешил тесту подключаться к базам.
+    """
+    databases = {"default"}
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.path = os.path.join(directory, "tuned.sqlite3")
+        connections.databases["tuned"] = {
+            "ENGINE": "yatube.db_backend",
+            "NAME": self.path,
+            "OPTIONS": {"pragmas": settings.SQLITE_PRAGMAS,
+                        "transaction_mode": "IMMEDIATE"},
+        }
+        self.addCleanup(self.remove_database)
+        self.connection = connections["tuned"]
+
+    def remove_database(self):
+        self.connection.close()
+        del connections.databases["tuned"]
+        if hasattr(connections._connections, "tuned"):
+            delattr(connections._connections, "tuned")
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("auto_vacuum"), 2)
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("temp_store"), 2)
+
+    def test_atomic_takes_write_lock(self):
+        """ atomic() сразу держит блокировку записи """
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using="tuned"):
+            with self.assertRaisesMessage(sqlite3.OperationalError,
+                                          "locked"):
+                other.execute("BEGIN IMMEDIATE")
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("ROLLBACK")
+
+    def test_bad_pragma(self):
+        connections.databases["tuned"]["OPTIONS"]["pragmas"] = {
+            "journal_mode": "WAL; DROP TABLE x"}
+        with self.assertRaises(ImproperlyConfigured):
+            self.connection.ensure_connection()
+
+    def test_dbmaintain(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE note (text TEXT)")
+            cursor.executemany("INSERT INTO note VALUES (?)",
+                               [("x" * 1000,)] * 200)
+            cursor.execute("DELETE FROM note")
+        self.assertGreater(self.pragma("freelist_count"), 0)
+        output = io.StringIO()
+        call_command("dbmaintain", database="tuned", stdout=output)
+        self.assertEqual(self.pragma("freelist_count"), 0)
+        self.assertIn("ANALYZE", output.getvalue())
+        self.assertIn("wal_checkpoint(TRUNCATE)", output.getvalue())
+        self.assertEqual(os.path.getsize(self.path + "-wal"), 0)
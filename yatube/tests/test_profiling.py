@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        overrides = self.settings(PROFILING_DIR=self.directory,
+                                  PROFILING_KEEP=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.staff = get_user_model().objects.create(username="staff",
+                                                     is_staff=True)
+        self.client = Client()
+
+    def test_only_staff_can_request(self):
+        self.client.get(reverse("posts:index"), {"_profile": 1})
+        self.assertEqual(os.listdir(self.directory), [])
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("posts:index"),
+                                   HTTP_X_PROFILE="1")
+        self.assertEqual(os.listdir(self.directory), [response["X-Profile"]])
+        self.assertIn("posts_index", response["X-Profile"])
+
+    def test_rotation_and_listing(self):
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get(reverse("posts:index"), {"_profile": 1})
+        data = self.client.get(reverse("profiles")).json()
+        self.assertEqual(len(data["profiles"]), 2)
+        summary = self.client.get(data["profiles"][0]["summary"])
+        self.assertContains(summary, "function calls")
+        download = self.client.get(data["profiles"][0]["download"])
+        self.assertEqual(download["Content-Disposition"].split(";")[0],
+                         "attachment")
+        response = self.client.get(reverse("profile_detail",
+                                           args=["..secret"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sampling(self):
+        with self.settings(PROFILING_SAMPLE_RATE=1.0):
+            response = self.client.get(reverse("posts:index"))
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
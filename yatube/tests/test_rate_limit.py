@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from yatube.middleware import rate_limit
+
+
+@override_settings(RATE_LIMITS={
+    "posts:add_comment": {"methods": ["POST"],
+                          "user": (2, 60), "ip": (3, 60)},
+    "posts:profile_follow": {"ip": (1, 60)},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create(username="author")
+        self.post = Post.objects.create(author=self.author, text="Запись")
+        self.url = reverse("posts:add_comment",
+                           args=["author", self.post.pk])
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def comment(self, client=None, **extra):
+        return (client or self.client).post(self.url, {"text": "Ответ"},
+                                            **extra)
+
+    def test_user_bucket(self):
+        self.assertEqual(self.comment().status_code, 302)
+        self.assertEqual(self.comment().status_code, 302)
+        with CaptureQueriesContext(connection) as queries, \
+                self.assertLogs("yatube.requests", "WARNING"):
+            response = self.comment()
+        self.assertEqual(response.status_code, 429)
+        # 60 секунд на 2 жетона: один жетон - через 30 секунд
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(Comment.objects.count(), 2)
+        # отказ обходится без чтения сессии и пользователя из базы
+        self.assertEqual(queries.captured_queries, [])
+        # GET под правило не попадает
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_bucket_refills(self):
+        with mock.patch("yatube.middleware.rate_limit.time.time") as clock:
+            clock.return_value = 1000.0
+            self.comment()
+            self.comment()
+            with self.assertLogs("yatube.requests", "WARNING"):
+                self.assertEqual(self.comment().status_code, 429)
+            clock.return_value = 1031.0
+            self.assertEqual(self.comment().status_code, 302)
+
+    def test_ip_bucket_shared_by_users(self):
+        other = Client()
+        other.force_login(
+            get_user_model().objects.create(username="other"))
+        for client in (self.client, self.client, other):
+            self.assertEqual(self.comment(client).status_code, 302)
+        with self.assertLogs("yatube.requests", "WARNING") as logs:
+            response = self.comment(other, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("(ip)", logs.output[0])
+        self.assertGreater(response.json()["retry_after"], 0)
+
+    def test_trip_counters(self):
+        url = reverse("posts:profile_follow", args=["author"])
+        guest = Client()
+        guest.get(url)
+        with self.assertLogs("yatube.requests", "WARNING"):
+            self.assertEqual(guest.get(url).status_code, 429)
+            guest.get(url)
+        self.assertEqual(rate_limit.trip_counters()["posts:profile_follow"],
+                         {"user": 0, "ip": 2})
+
+        page = reverse("rate_limits")
+        self.assertEqual(self.client.get(page).status_code, 302)
+        staff = get_user_model().objects.create(username="staff",
+                                                is_staff=True)
+        self.client.force_login(staff)
+        limits = self.client.get(page).json()["limits"]
+        self.assertEqual(limits["posts:profile_follow"]["trips"]["ip"], 2)
+        self.assertEqual(limits["posts:add_comment"]["user"], [2, 60])
@@ -0,0 +1,93 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Post
+from yatube import db_router
+
+
+class ReplicaTests(TransactionTestCase):
+    """ Реплика - копия файла базы, которую обновляет sync_replicas """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "replica.sqlite3")
+        connections.databases["replica1"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": f"file:{path}?mode=ro",
+            "OPTIONS": {"uri": True},
+        }
+        self.addCleanup(self.remove_replica)
+        overrides = self.settings(DATABASE_REPLICAS={"replica1": path})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.author = get_user_model().objects.create(username="author")
+        Post.objects.create(author=self.author, text="Первая запись")
+        self.sync()
+
+    def remove_replica(self):
+        connections["replica1"].close()
+        del connections.databases["replica1"]
+        if hasattr(connections._connections, "replica1"):
+            delattr(connections._connections, "replica1")
+
+    def sync(self):
+        call_command("sync_replicas", stdout=io.StringIO())
+
+    def index_texts(self, client):
+        response = client.get(reverse("posts:index"))
+        return [post.text for post in response.context["page"]]
+
+    def test_reads_lag_until_sync(self):
+        Post.objects.create(author=self.author, text="Вторая запись")
+        reader = Client()
+        self.assertEqual(self.index_texts(reader), ["Первая запись"])
+        self.sync()
+        # кэш фрагмента со старой копии после копирования не используется
+        self.assertEqual(self.index_texts(reader),
+                         ["Вторая запись", "Первая запись"])
+
+    def test_writer_reads_own_writes(self):
+        writer = Client()
+        writer.force_login(self.author)
+        response = writer.post(reverse("posts:new_post"),
+                               {"text": "Свежая запись"})
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.index_texts(writer),
+                         ["Свежая запись", "Первая запись"])
+        self.assertEqual(self.index_texts(Client()), ["Первая запись"])
+
+    def test_sessions_from_primary(self):
+        """ Сессия и пользователь новее копии читаются из default """
+        reader = get_user_model().objects.create(username="reader")
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse("posts:index"))
+        self.assertTrue(response.context["user"].is_authenticated)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_routing(self):
+        router = db_router.ReplicaRouter()
+        self.assertFalse(router.allow_migrate("replica1", "posts"))
+        self.assertIsNone(router.allow_migrate("default", "posts"))
+        db_router.reset()
+        db_router.read_from("replica1")
+        try:
+            self.assertEqual(router.db_for_read(Post), "replica1")
+            self.assertEqual(router.db_for_write(Post), "default")
+            # после записи запрос читает то, что записал
+            self.assertIsNone(router.db_for_read(Post))
+            self.assertEqual(router.db_for_read(get_user_model()), "default")
+        finally:
+            db_router.reset()
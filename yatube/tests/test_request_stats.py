@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.template.backends.django import Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.middleware import request_stats
+
+
+class RequestStatsTests(TestCase):
+    def setUp(self):
+        request_stats.reset_stats()
+        self.client = Client()
+
+    def test_headers_and_summary(self):
+        response = self.client.get(reverse("posts:index"))
+        queries = int(response["X-Query-Count"])
+        self.assertGreater(queries, 0)
+        self.assertIn("tpl;dur=", response["Server-Timing"])
+        row = request_stats.stats_snapshot()["posts:index"]
+        self.assertEqual((row["requests"], row["queries"]), (1, queries))
+        self.assertGreater(row["template_ms"], 0)
+
+    def test_framework_template_untouched(self):
+        """ Время шаблонов засекает бэкенд проекта, а не подмена Django """
+        self.client.get(reverse("posts:index"))
+        self.assertEqual(Template.render.__module__,
+                         "django.template.backends.django")
+
+    def test_over_budget_logged(self):
+        budgets = {"posts:index": {"anonymous": 0, "user": 0}}
+        with mock.patch.object(request_stats, "_budgets", budgets), \
+                self.assertLogs("yatube.requests", "WARNING") as logs:
+            self.client.get(reverse("posts:index"))
+        self.assertIn("posts:index: ", logs.output[0])
+        self.assertIn("запросов при бюджете 0", logs.output[0])
+
+    def test_stats_page_for_staff_only(self):
+        url = reverse("request_stats")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = get_user_model().objects.create(username="staff",
+                                                is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse("posts:index"))
+        data = self.client.get(url, {"reset": 1}).json()
+        self.assertEqual(data["views"]["posts:index"]["requests"], 1)
+        self.assertIn("budget", data["views"]["posts:index"])
+        self.assertNotIn("posts:index", request_stats.stats_snapshot())
@@ -11,6 +11,8 @@ Class-based views
     2. Add a URL to urlpatterns:  path('', Home.as_view(), name='home')
 Including another URLconf
     1. Import the include() function: from django.urls import include, path
+
+from . import views
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 # from django.conf.urls import handler404, handler500
@@ -19,6 +21,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from . import views
+
 urlpatterns = [
     # импорт правил из приложения posts
     path("about/", include("about.urls", namespace="about")),
@@ -26,6 +30,12 @@ urlpatterns = [
     path("auth/", include("users.urls")),
     # если не нашлось нужного шаблона для /auth
     path("auth/", include("django.contrib.auth.urls")),
+    # сводка замеров страниц, выше admin/
+    path("admin/request-stats/", views.request_stats, name="request_stats"),
+    path("admin/rate-limits/", views.rate_limits, name="rate_limits"),
+    path("admin/profiles/", views.profiles, name="profiles"),
+    path("admin/profiles/<str:name>/", views.profile_detail,
+         name="profile_detail"),
     # импорт правил из приложения admin
     path("admin/", admin.site.urls),
     path("", include("posts.urls")),
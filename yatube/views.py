@@ -0,0 +1,76 @@
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+
+from .middleware.profiling import list_profiles, profile_path
+from .middleware.rate_limit import trip_counters
+from .middleware.request_stats import (load_query_budgets, reset_stats,
+                                       stats_snapshot)
+
+
+@staff_member_required
+def request_stats(request):
+    """ Сводка RequestStatsMiddleware по маршрутам этого процесса
+
+    ?reset=1 обнуляет сводку после выдачи.
+    """
+    views = stats_snapshot()
+    budgets = load_query_budgets()
+    for name, row in views.items():
+        requests = row["requests"]
+        row.update({
+            "avg_queries": round(row["queries"] / requests, 2),
+            "avg_sql_ms": round(row["sql_ms"] / requests, 2),
+            "avg_template_ms": round(row["template_ms"] / requests, 2),
+            "avg_total_ms": round(row["total_ms"] / requests, 2),
+            "budget": budgets.get(name),
+        })
+    if request.GET.get("reset"):
+        reset_stats()
+    ordered = dict(sorted(views.items(),
+                          key=lambda item: -item[1]["total_ms"]))
+    return JsonResponse({"pid": os.getpid(), "views": ordered})
+
+
+@staff_member_required
+def rate_limits(request):
+    """ Правила RateLimitMiddleware и сколько раз они срабатывали """
+    counters = trip_counters()
+    return JsonResponse({"limits": {
+        name: {**rule, "trips": counters[name]}
+        for name, rule in settings.RATE_LIMITS.items()
+    }})
+
+
+@staff_member_required
+def profiles(request):
+    """ Последние профили ProfilingMiddleware """
+    entries = list_profiles()
+    for entry in entries:
+        url = reverse("profile_detail", args=[entry["name"]])
+        entry.update({"download": url, "summary": url + "?format=text"})
+    return JsonResponse({"profiles": entries})
+
+
+@staff_member_required
+def profile_detail(request, name):
+    """ Файл .pstats или ?format=text - самые дорогие функции """
+    path = profile_path(name)
+    if path is None or not os.path.exists(path):
+        raise Http404("Профиль не найден")
+    if request.GET.get("format") != "text":
+        return FileResponse(open(path, "rb"), as_attachment=True,
+                            filename=name)
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    sort = request.GET.get("sort")
+    if sort not in ("cumulative", "tottime", "calls"):
+        sort = "cumulative"
+    stats.sort_stats(sort).print_stats(40)
+    return HttpResponse(output.getvalue(),
+                        content_type="text/plain; charset=utf-8")